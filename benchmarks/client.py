@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+
+# Author: Will Stevens (CloudOps) - wstevens@cloudops.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmarks the client against a local 'csapi.fakeserver', which is started in
+its own process so it does not compete with the client for the CPU.  Each
+workload also runs in its own process, so its peak memory use is not hidden by
+the peak of an earlier workload.
+
+Usage:
+  client.py [options]
+  client.py (-h | --help)
+
+Options:
+  -h --help                 Show this screen.
+  --workloads=<arg>         Comma separated workloads to run [default: serial,threaded,bulk,list,jobs].
+  --requests=<arg>          Number of requests made by the serial, threaded and bulk workloads [default: 2000].
+  --threads=<arg>           Number of threads of the threaded and bulk workloads [default: 8].
+  --records=<arg>           Number of records listed by the list workload [default: 20000].
+  --jobs=<arg>              Number of async jobs started by the jobs workload [default: 200].
+  --latency=<arg>           Seconds added by the server to every response [default: 0].
+  --job_latency=<arg>       Seconds it takes for an async job to complete [default: 0.5].
+  --run=<arg>               Run a single workload against '--endpoint' and print its results as JSON.
+  --endpoint=<arg>          Endpoint of the server used by '--run'.
+"""
+
+import docopt
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+from csapi import API
+
+try:
+    from urllib2 import urlopen
+except ImportError:  # python 3
+    from urllib.request import urlopen
+
+
+def start_server(args):
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    server = subprocess.Popen([
+        sys.executable, '-m', 'csapi.fakeserver',
+        '--port=%d' % port,
+        '--records=%s' % args['--records'],
+        '--latency=%s' % args['--latency'],
+        '--job_latency=%s' % args['--job_latency']
+    ], env=env, stdout=subprocess.PIPE)
+
+    stats = 'http://127.0.0.1:%d/stats' % port
+    for _ in range(100):
+        try:
+            urlopen(stats)
+            break
+        except IOError:
+            time.sleep(0.1)
+    return server, 'http://127.0.0.1:%d/client/api' % port, stats
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def timed(api, params, latencies):
+    start = time.time()
+    api.request(params)
+    latencies.append(time.time() - start)
+
+
+def serial(api, args, latencies):
+    for i in range(int(args['--requests'])):
+        timed(api, {'command':'listZones', 'page':1, 'pagesize':1}, latencies)
+    return int(args['--requests'])
+
+
+def threaded(api, args, latencies):
+    threads = int(args['--threads'])
+    per_thread = int(args['--requests']) // threads
+
+    def run():
+        for i in range(per_thread):
+            timed(api, {'command':'listZones', 'page':1, 'pagesize':1}, latencies)
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return per_thread * threads
+
+
+def bulk(api, args, latencies):
+    # the calls run on the threads of 'request_many', time them from its hooks
+    api.after_request.append(lambda params, method, result, stats: latencies.append(
+        stats['sign'] + stats.get('network', 0) + stats.get('decode', 0)))
+    api.request_many([
+        {'command':'listZones', 'page':1, 'pagesize':1}
+        for i in range(int(args['--requests']))
+    ], max_workers=int(args['--threads']))
+    return int(args['--requests'])
+
+
+def listing(api, args, latencies):
+    count = 0
+    for record in api.iter_list({'command':'listVirtualMachines'}, parallel=4):
+        count += 1
+    return count
+
+
+def jobs(api, args, latencies):
+    handles = [
+        api.submit({'command':'stopVirtualMachine', 'id':str(i)})
+        for i in range(int(args['--jobs']))
+    ]
+    api.wait(handles)
+    return len(handles)
+
+
+WORKLOADS = {
+    'serial': serial,
+    'threaded': threaded,
+    'bulk': bulk,
+    'list': listing,
+    'jobs': jobs
+}
+
+
+def run(name, args, endpoint):
+    stats_url = endpoint.replace('/client/api', '/stats')
+    api = API('key', 'secret', endpoint, pool_maxsize=int(args['--threads']))
+    latencies = []
+    before = json.loads(urlopen(stats_url).read().decode('utf-8'))
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.time()
+    items = WORKLOADS[name](api, args, latencies)
+    elapsed = time.time() - start
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss
+    after = json.loads(urlopen(stats_url).read().decode('utf-8'))
+    api.close()
+    return {
+        'items': items,
+        'elapsed': elapsed,
+        'p50': percentile(latencies, 0.5),
+        'p99': percentile(latencies, 0.99),
+        'connections': after['connections'] - before['connections'] - 1,  # the stats request
+        'rss': rss
+    }
+
+
+if __name__ == '__main__':
+    args = docopt.docopt(__doc__)
+    if args['--run']:
+        print(json.dumps(run(args['--run'], args, args['--endpoint'])))
+        sys.exit(0)
+
+    server, endpoint, stats_url = start_server(args)
+    try:
+        print("%-10s %10s %10s %10s %10s %12s %10s %12s" % (
+            'workload', 'items', 'seconds', 'items/s', 'p50 ms', 'p99 ms', 'conns', 'rss +KB'))
+        for name in args['--workloads'].split(','):
+            # 'ru_maxrss' is the peak of the whole process, start a fresh one per workload
+            output = subprocess.check_output([
+                sys.executable, os.path.abspath(__file__),
+                '--run=%s' % name,
+                '--endpoint=%s' % endpoint
+            ] + sys.argv[1:])
+            result = json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+            p50, p99 = result['p50'], result['p99']
+            print("%-10s %10d %10.2f %10.0f %10s %12s %10d %12d" % (
+                name, result['items'], result['elapsed'], result['items'] / result['elapsed'],
+                '%.2f' % (p50 * 1000) if p50 is not None else '-',
+                '%.2f' % (p99 * 1000) if p99 is not None else '-',
+                result['connections'],
+                result['rss']
+            ))
+    finally:
+        server.terminate()
+        server.wait()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+# Author: Will Stevens (CloudOps) - wstevens@cloudops.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compares the cost of signing a request with 'API.sign' against the original
+implementation, which quoted every value and created a new hmac on every call.
+
+Usage:
+  sign.py [--number=<arg>]
+  sign.py (-h | --help)
+
+Options:
+  -h --help                 Show this screen.
+  --number=<arg>            Number of requests to sign [default: 100000].
+"""
+
+import base64
+import docopt
+import hashlib
+import hmac
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from csapi import API
+from csapi.csapi import cs_quote
+
+SECRET_KEY = 'Gd3OCfQkJmTf4xg7dWmgdGcaBx-E6X4ffh6cj1ON8WeaHn5hiVB7L4V8ZFZg0WbkGyC-cmkYKY_Thu7sSa8kWw'
+
+
+def legacy_sign(params):
+    query = "&".join(sorted([
+        "=".join((k, cs_quote(v))).lower()
+        for k, v in params.items()
+    ]))
+    return base64.b64encode(
+        hmac.new(
+            SECRET_KEY.encode('utf-8'),
+            query.encode('utf-8'),
+            hashlib.sha1).digest()
+        ).decode('utf-8').strip()
+
+
+def make_params(i):
+    return {
+        'command':'stopVirtualMachine',
+        'id':'2c7f5a6e-%04d-4c1e-9c6a-6d1e0f3c8b%02d' % (i % 10000, i % 100),
+        'zoneid':'a5e2e0b4-9a3c-4d8e-8f1b-3c2d1e0f9a7b',
+        'forced':'true',
+        'response':'json',
+        'apiKey':'zNDjIg9Yzq2tXbVjfVQvPB4WsKJGVm7VIUt3zAYv6b4vA8a7mnnW5IV3KYwg-2VqFbpOr8zJQsvNlTGDF0xZLQ'
+    }
+
+
+if __name__ == '__main__':
+    args = docopt.docopt(__doc__)
+    number = int(args['--number'])
+    api = API('key', SECRET_KEY)
+    params = [make_params(i) for i in range(number)]
+
+    for params_ in params[:100]:
+        assert api.sign(params_) == legacy_sign(params_)
+
+    before = timeit.timeit(lambda: [legacy_sign(p) for p in params], number=1)
+    after = timeit.timeit(lambda: [api.sign(p) for p in params], number=1)
+    batch = timeit.timeit(lambda: api.sign_many(params), number=1)
+
+    print("requests signed:   %d" % number)
+    print("original sign:     %.2f us/request" % (before / number * 1e6))
+    print("API.sign:          %.2f us/request" % (after / number * 1e6))
+    print("API.sign_many:     %.2f us/request" % (batch / number * 1e6))
+    print("speedup:           %.2fx" % (before / after))
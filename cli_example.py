@@ -30,6 +30,9 @@ Options:
   --log=<arg>               The log file to be used [default: logs/cs_api.log].
   --clear_log=<arg>         Removes the log each time the API object is created [default: True].
   --async=<arg>             Boolean to specify if the API should wait for async calls [default: False].
+  --cache=<arg>             Directory used to cache the results of 'list*' and 'get*' calls between runs.
+  --cache_ttl=<arg>         Number of seconds the cached results are valid for [default: 60].
+  --parallel=<arg>          Number of requests run at the same time by 'run_batch' [default: 10].
 """
 
 from csapi import CLI
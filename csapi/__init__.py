@@ -1,2 +1,32 @@
+import sys
+
 from .csapi import API
 from .cli import CLI
+from .endpoints import EndpointPool
+from .jobs import Job, JobTracker
+from .ratelimit import TokenBucket
+
+# the optional features are only imported when they are first used, asyncio alone
+# takes longer to import than the rest of the package (python 3.7+)
+_LAZY = {
+    'AsyncAPI': 'aio',
+    'Metrics': 'metrics',
+    'Record': 'records',
+    'RecordStore': 'records',
+    'ResponseCache': 'cache',
+}
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        if name not in _LAZY:
+            raise AttributeError("module %r has no attribute %r" % (__name__, name))
+        import importlib
+        module = importlib.import_module('.' + _LAZY[name], __name__)
+        return getattr(module, name)
+else:
+    from .cache import ResponseCache
+    from .metrics import Metrics
+    from .records import Record, RecordStore
+
+    if sys.version_info >= (3, 5):
+        from .aio import AsyncAPI
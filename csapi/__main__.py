@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+# Author: Will Stevens (CloudOps) - wstevens@cloudops.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Runs a batch of CloudStack API requests over a single pooled connection.  The
+requests are read as JSON lines of request params and the results are written to
+stdout as JSON lines as they complete.
+
+  $ echo '{"command": "listZones"}' | python -m csapi --json=config.json
+
+Usage:
+  csapi [--json=<arg>] [--api_key=<arg> --secret_key=<arg>] [options]
+  csapi (-h | --help)
+
+Options:
+  -h --help                 Show this screen.
+  --json=<arg>              Path to a JSON config file with the same names as the options (without the -- in front).
+  --api_key=<arg>           CS Api Key.
+  --secret_key=<arg>        CS Secret Key.
+  --endpoint=<arg>          CS Endpoint [default: http://127.0.0.1:8080/client/api].
+  --batch=<arg>             File with one JSON object of request params per line, '-' for stdin [default: -].
+  --parallel=<arg>          Number of requests run at the same time [default: 10].
+  --poll_interval=<arg>     Interval, in seconds, to check for a result on async jobs [default: 5].
+  --logging=<arg>           Boolean to turn on or off logging [default: False].
+  --log=<arg>               The log file to be used [default: logs/cs_api.log].
+  --clear_log=<arg>         Removes the log each time the API object is created [default: False].
+  --async=<arg>             Boolean to specify if the API should wait for async calls [default: False].
+  --cache=<arg>             Directory used to cache the results of 'list*' and 'get*' calls between runs.
+  --cache_ttl=<arg>         Number of seconds the cached results are valid for [default: 60].
+"""
+
+import sys
+from .cli import CLI
+
+
+def main():
+    api = CLI(__doc__)
+    batch = api.args['--batch']
+    try:
+        if batch == '-':
+            errors = api.run_batch(iter(sys.stdin.readline, ''))
+        else:
+            with open(batch) as lines:
+                errors = api.run_batch(lines)
+    finally:
+        api.close()
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
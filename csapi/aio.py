@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+
+# Author: Will Stevens (CloudOps) - wstevens@cloudops.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+import time
+from .csapi import BaseAPI
+from .endpoints import idempotent
+from .ratelimit import TokenBucket
+
+
+class AsyncAPI(BaseAPI):
+    """
+    An asyncio version of the API class (python 3.5+, requires 'aiohttp').  It
+    takes the same arguments as API (except 'batch_polls' and 'workers'), plus
+    'limit' which caps the number of requests in flight, and 'request' is a
+    coroutine.  Async jobs are awaited by 'request' (unless 'async'), there is
+    no 'submit' or 'iter_list' and responses can not be streamed.
+
+    async with AsyncAPI(**args) as api:
+        accounts = await api.request({
+            'command':'listAccounts'
+        })
+        vms = await asyncio.gather(*[
+            api.request({'command':'listVirtualMachines', 'zoneid':zone})
+            for zone in zones
+        ])
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.limit = kwargs.pop('limit', 100)
+        super(AsyncAPI, self).__init__(*args, **kwargs)
+        self._client = None
+        self._limiter = None
+
+
+    async def __aenter__(self):
+        return self
+
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+
+
+    @property
+    def client(self):
+        """
+        The pooled 'aiohttp.ClientSession', created on first use from within the
+        event loop.
+        """
+        if self._client is None or self._client.closed:
+            try:
+                import aiohttp
+            except ImportError:
+                raise ImportError("AsyncAPI requires 'aiohttp': pip install csapi[async]")
+
+            if isinstance(self.timeout, tuple):
+                timeout = aiohttp.ClientTimeout(
+                    sock_connect=self.timeout[0], sock_read=self.timeout[1])
+            else:
+                timeout = aiohttp.ClientTimeout(total=self.timeout)
+            trace = aiohttp.TraceConfig()
+            trace.on_connection_create_end.append(self._connected)
+            trace.on_connection_reuseconn.append(self._connected)
+            self._client = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.pool_connections * self.pool_maxsize,
+                    limit_per_host=self.pool_maxsize,
+                    force_close=not self.keep_alive
+                ),
+                timeout=timeout,
+                trace_configs=[trace]
+            )
+            self._limiter = asyncio.Semaphore(self.limit)
+        return self._client
+
+
+    @staticmethod
+    async def _connected(session, context, params):
+        if context.trace_request_ctx is not None:
+            context.trace_request_ctx['connected'] = time.time()
+
+
+    async def aclose(self):
+        """
+        Closes all the pooled connections.
+        """
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+    async def request(self, params, method=None, compact=False):
+        """
+        Builds the request and returns a python dictionary of the result or None.
+
+        :param params: the query parameters to be sent to the server
+        :type params: dict
+
+        :param compact: return the records of a list response as a RecordStore
+        :type compact: bool
+
+        :returns: the result of the request as a python dictionary
+        :rtype: dict or None
+        """
+        if self.cache is not None:
+            cached = self.cache.get(params, self.api_key)
+            if cached is not None:
+                return self._compact(cached) if compact else cached
+
+        result = await self._call(params, method)
+
+        # if the request was an async call, then wait for the result...
+        if not getattr(self, 'async') and result and 'jobid' in result.keys() and \
+                result.get('jobstatus', 0) == 0:
+            start = time.time()
+            result = await self.wait_job(result)
+            if self.metrics is not None:
+                self.metrics.record(params['command'], 'poll', time.time() - start)
+
+        if self.cache is not None:
+            self.cache.set(params, result, self.api_key)
+        return self._compact(result) if compact else result
+
+
+    async def request_many(self, param_list, max_workers=None, rate=None, method=None):
+        """
+        Makes many requests concurrently and returns their results in the same
+        order as 'param_list'.  A failing call does not stop the others, the
+        exception it raised is returned in its place.
+
+        :param param_list: the query parameters of each request
+        :type param_list: list
+
+        :param max_workers: the number of concurrent requests, 'limit' if None
+        :type max_workers: int or None
+
+        :param rate: the maximum number of requests started per second
+        :type rate: float or TokenBucket or None
+
+        :returns: the result (or exception) of each request
+        :rtype: list
+        """
+        if rate is not None and not isinstance(rate, TokenBucket):
+            rate = TokenBucket(rate)
+        workers = asyncio.Semaphore(max_workers or self.limit)
+
+        async def call(params):
+            async with workers:
+                if rate is not None:
+                    await asyncio.sleep(rate.delay())
+                return await self.request(params, method)
+
+        return await asyncio.gather(
+            *[call(params) for params in param_list], return_exceptions=True)
+
+
+    async def wait_job(self, result):
+        """
+        Polls an async job until it completes, backing off from
+        'poll_min_interval' to 'poll_interval' between polls.
+
+        :param result: the response of an async call
+        :type result: dict
+
+        :returns: the 'jobresult' of a successful job, the full query result of a
+                  failed (or timed out) job, or the error (None if there was no
+                  response) of a job which could not be queried
+        :rtype: dict or None
+        """
+        interval = self.poll_min_interval
+        deadline = time.time() + self.job_timeout if self.job_timeout else None
+        while result and result.get('jobstatus', 0) == 0:
+            if deadline and time.time() >= deadline:
+                return result
+            if self.logging:
+                self.logger.info('polling...')
+
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, self.poll_interval)
+            query = await self._call({
+                'command':'queryAsyncJobResult',
+                'jobId':result['jobid']
+            })
+            if not query or 'errorcode' in query:
+                # eg: the job expired, it will never complete
+                return query
+            result = query
+
+        if result and result.get('jobstatus') == 1 and 'jobresult' in result:
+            result = result['jobresult']
+        return result
+
+
+    async def _call(self, params, method=None):
+        """
+        Makes a single API call and returns the unwrapped response.
+        """
+        stats = self._begin(params, method)
+        if stats is None:
+            return None
+
+        import aiohttp
+        client = self.client
+        fields = dict(
+            (k, ",".join(v) if type(v) is list else str(v))
+            for k, v in params.items()
+        )
+        is_post = method and method.upper() == 'POST'
+        # only read only requests are sent again once they reached a server
+        safe = idempotent(params)
+        failover = len(self.endpoints) - 1 if safe else 0
+        tried = []
+        attempt = 0
+        start = time.time()
+        while True:
+            response = None
+            async with self._limiter:
+                endpoint = self.endpoints.acquire(exclude=tried)
+                tried.append(endpoint)
+                # '_connected' sets when a pooled connection was obtained, the
+                # time spent waiting for one is not the endpoint's latency
+                timing = {'sent': time.time()}
+                ok = False
+                try:
+                    if is_post:
+                        response = await client.post(
+                            endpoint.url, data=fields, trace_request_ctx=timing)
+                    else:
+                        response = await client.get(
+                            endpoint.url, params=fields, trace_request_ctx=timing)
+                    async with response:
+                        body = await response.read()
+                    ok = response.status < 500
+                except aiohttp.ClientConnectorError as e:
+                    # the request never reached the server, so it is safe to retry
+                    if attempt >= max(self.retries, failover):
+                        stats.update(network=time.time() - start, retries=attempt,
+                            error=e.__class__.__name__)
+                        self._observe(params, method, None, stats)
+                        raise
+                except Exception as e:
+                    # eg: a timeout or a dropped connection
+                    stats.update(network=time.time() - start, retries=attempt,
+                        error=e.__class__.__name__)
+                    self._observe(params, method, None, stats)
+                    raise
+                finally:
+                    self.endpoints.release(
+                        endpoint, time.time() - timing.get('connected', timing['sent']), ok)
+
+            if response is not None:
+                if response.status >= 500 and attempt < failover:
+                    # a read only request can go to another endpoint right away
+                    attempt += 1
+                    continue
+                if not safe or response.status not in self.retry_statuses or \
+                        attempt >= self.retries:
+                    break
+
+            await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+            attempt += 1
+        stats['network'] = time.time() - start
+
+        text = body.decode(response.charset or 'utf-8')
+        decode = []
+        def load():
+            start = time.time()
+            try:
+                return json.loads(text)
+            finally:
+                decode.append(time.time() - start)
+
+        try:
+            result = self._result(
+                params, method, response.status, load,
+                lambda: text, str(response.url))
+        except Exception as e:
+            stats.update(status=response.status, decode=sum(decode),
+                error=e.__class__.__name__)
+            self._observe(params, method, None, stats)
+            raise
+
+        if self.metrics is not None or self.after_request:
+            stats.update(
+                status=response.status,
+                decode=sum(decode),
+                bytes_sent=len(str(response.url)) + (len(str(fields)) if is_post else 0),
+                bytes_received=len(body),
+                retries=attempt,
+                error=self._error(response.status, result)
+            )
+            self._observe(params, method, result, stats)
+        return result
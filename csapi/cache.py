@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+
+# Author: Will Stevens (CloudOps) - wstevens@cloudops.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+# params which do not change the result of a request
+IGNORED_PARAMS = ('signature', 'apikey', 'response')
+
+# read only commands which return credentials (the accounts list their users),
+# they are not cached unless asked for
+SECRET_COMMANDS = ('getUserKeys', 'getVMPassword', 'listUsers', 'listAccounts')
+
+
+def _singular(name):
+    # 'snapshotpolicies' -> 'snapshotpolicy', 'virtualmachines' -> 'virtualmachine'
+    if name.endswith('ies'):
+        return name[:-3] + 'y'
+    if name.endswith('s'):
+        return name[:-1]
+    return name
+
+
+class ResponseCache(object):
+    """
+    A TTL and LRU bounded cache for the results of read only commands, pass it
+    to the API object with the 'cache' argument.
+
+    api = API(api_key, secret_key, cache=ResponseCache(ttl=60, ttls={'listZones':3600}))
+
+    Only the commands starting with one of 'prefixes' are cached.  Any other
+    command is considered to modify its resource, so it evicts the cached
+    results of the commands on the same resource family (eg: 'stopVirtualMachine'
+    evicts 'listVirtualMachines').  The commands in 'exclude' (by default the
+    ones returning credentials) are neither cached nor evict anything.  When
+    'path' is set, the entries are also stored as files in that directory, only
+    readable by the current user, so they are shared between processes.  The
+    results are scoped by the 'scope' of 'get' and 'set' (the API key of the API
+    object), so the same cache is never shared between credentials.
+    """
+
+    def __init__(
+            self,
+            ttl=60,
+            ttls=None,
+            maxsize=1024,
+            path=None,
+            prefixes=('list', 'get'),
+            exclude=SECRET_COMMANDS):
+        self.ttl = ttl
+        self.ttls = dict((k.lower(), v) for k, v in (ttls or {}).items())
+        self.maxsize = maxsize
+        self.path = path
+        self.prefixes = prefixes
+        self.exclude = set(c.lower() for c in exclude)
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+        if self.path and not os.path.exists(self.path):
+            os.makedirs(self.path, 0o700)
+
+
+    def cacheable(self, params):
+        command = params.get('command', '')
+        return command.startswith(self.prefixes) and command.lower() not in self.exclude
+
+
+    def get(self, params, scope=None):
+        """
+        Returns the cached result of a request or None.
+        """
+        if not self.cacheable(params):
+            return None
+
+        key = self._key(params, scope)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None and entry[0] > time.time():
+                self._entries[key] = entry  # most recently used
+            else:
+                entry = None
+
+        if entry is None and self.path:
+            entry = self._read(key)
+            if entry is not None:
+                with self._lock:
+                    self._add(key, entry)
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(entry[1])
+
+
+    def set(self, params, result, scope=None):
+        """
+        Caches the result of a read only request, or evicts the results of the
+        resource family of any other request.
+        """
+        if not self.cacheable(params):
+            if params.get('command', '').lower() not in self.exclude:
+                self.invalidate(params.get('command', ''))
+            return
+        if result is None or 'errorcode' in result:
+            return
+
+        command = params['command'].lower()
+        key = self._key(params, scope)
+        entry = (time.time() + self.ttls.get(command, self.ttl), json.dumps(result))
+        with self._lock:
+            self._entries.pop(key, None)
+            self._add(key, entry)
+        if self.path:
+            self._write(key, entry)
+
+
+    def invalidate(self, command=None):
+        """
+        Evicts the cached results of the resource family of 'command', or the
+        whole cache if 'command' is None.
+        """
+        family = _singular(self._family(command)) if command else ''
+
+        def related(key):
+            # 'virtualmachine' matches 'virtualmachines' and 'nictovirtualmachine',
+            # 'snapshotpolicy' matches 'snapshotpolicies'
+            cached = _singular(key.split('-')[0])
+            return family in cached or cached in family
+
+        with self._lock:
+            for key in list(self._entries.keys()):
+                if related(key):
+                    del self._entries[key]
+        if self.path:
+            for name in os.listdir(self.path):
+                if not name.startswith('.') and related(name):
+                    self._remove(os.path.join(self.path, name))
+
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries)
+            }
+
+
+    def _add(self, key, entry):
+        self._entries[key] = entry
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+    def _family(self, command):
+        # 'listVirtualMachines' -> 'virtualmachines', 'stopVirtualMachine' -> 'virtualmachine'
+        return re.sub(r'^[a-z]+', '', command).lower()
+
+
+    def _key(self, params, scope=None):
+        query = "&".join(sorted(
+            "%s=%s" % (k.lower(), ",".join(v) if type(v) is list else v)
+            for k, v in params.items()
+            if k.lower() not in IGNORED_PARAMS
+        ))
+        return "%s-%s-%s" % (
+            self._family(params['command']),
+            hashlib.sha1((scope or '').encode('utf-8')).hexdigest()[:12],
+            hashlib.sha1(query.encode('utf-8')).hexdigest()
+        )
+
+
+    def _read(self, key):
+        try:
+            with open(os.path.join(self.path, key)) as f:
+                entry = tuple(json.load(f))
+        except (IOError, OSError, ValueError):
+            return None
+        if entry[0] > time.time():
+            return entry
+        self._remove(os.path.join(self.path, key))
+        return None
+
+
+    def _write(self, key, entry):
+        # write then rename so other processes never read a partial file
+        tmp = os.path.join(self.path, '.%s.%s.%s' % (
+            key, os.getpid(), threading.current_thread().ident))
+        # the results may hold sensitive data, keep them private to the user
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entry, f)
+        os.rename(tmp, os.path.join(self.path, key))
+
+        names = [n for n in os.listdir(self.path) if not n.startswith('.')]
+        if len(names) > self.maxsize:
+            paths = sorted(
+                (os.path.join(self.path, n) for n in names),
+                key=lambda p: os.path.getmtime(p) if os.path.exists(p) else 0
+            )
+            for p in paths[:len(paths) - self.maxsize]:
+                self._remove(p)
+
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -32,9 +32,11 @@ Options:
   --log=<arg>               The log file to be used [default: logs/cs_api.log].
   --clear_log=<arg>         Removes the log each time the API object is created [default: True].
   --async=<arg>             Boolean to specify if the API should wait for async calls [default: False].
+  --cache=<arg>             Directory used to cache the results of 'list*' and 'get*' calls between runs.
+  --cache_ttl=<arg>         Number of seconds the cached results are valid for [default: 60].
+  --parallel=<arg>          Number of requests run at the same time by 'run_batch' [default: 10].
 """
 
-import docopt
 import json
 import sys
 from .csapi import API
@@ -48,9 +50,13 @@ class CLI(API):
     accounts = api.request({
         'command':'listAccounts'
     })
+
+    Many requests can also be run from a stream of JSON lines with 'run_batch',
+    see 'python -m csapi --help'.
     """
     def __init__(self, doc_str):
         args = self.load_config(doc_str)
+        self.args = args
 
         api_key = args['--api_key']
         secret_key = args['--secret_key']
@@ -59,7 +65,15 @@ class CLI(API):
         logging = True if args['--logging'].lower() == 'true' else False
         log = args['--log']
         clear_log = True if args['--clear_log'].lower() == 'true' else False
-        async = True if args['--async'].lower() == 'true' else False
+        async_ = True if args['--async'].lower() == 'true' else False
+        parallel = int(args.get('--parallel') or 0) or None
+        cache = None
+        if args.get('--cache'):
+            from .cache import ResponseCache
+            cache = ResponseCache(
+                ttl=float(args.get('--cache_ttl') or 60),
+                path=args['--cache']
+            )
 
         super(CLI, self).__init__(
             api_key,
@@ -69,11 +83,71 @@ class CLI(API):
             logging,
             log,
             clear_log,
-            async
+            async_,
+            cache=cache,
+            # enough pooled connections for all the requests run at the same time
+            pool_maxsize=max(parallel or 0, 10),
+            workers=parallel
         )
 
 
+    def run_batch(self, lines, out=None):
+        """
+        Runs the requests read from 'lines', one JSON object of request params per
+        line, on the worker threads and writes the result of each one to 'out' as
+        a JSON line as soon as it completes.  The results are not in the same order
+        as the requests, their 'index' is the line number of the request.
+
+        {"index": 0, "request": {"command": "listZones"}, "result": {...}}
+        {"index": 1, "error": "ValueError: No JSON object could be decoded"}
+        {"index": 2, "request": {...}, "result": {...}, "error": "431: Unable to execute API command..."}
+
+        A request which raises, returns no result (eg: an HTTP error while logging
+        is off) or returns an error (including a failed async job) is an error.
+
+        :param lines: the requests, eg: an open file or sys.stdin
+        :type lines: iterable
+
+        :param out: where the results are written, sys.stdout if None
+        :type out: file or None
+
+        :returns: the number of requests which failed
+        :rtype: int
+        """
+        def run(item):
+            index, line = item
+            try:
+                params = json.loads(line)
+                request = dict(params)
+                result = self.request(params)
+            except Exception as e:
+                return {'index': index, 'error': '%s: %s' % (e.__class__.__name__, e)}
+
+            output = {'index': index, 'request': request, 'result': result}
+            error = result
+            if result and result.get('jobstatus') == 2:  # a failed async job
+                error = result.get('jobresult') or {}
+            if result is None:
+                output['error'] = 'no result, see the log (--logging) for the details'
+            elif 'errorcode' in error:
+                output['error'] = '%s: %s' % (error['errorcode'], error.get('errortext'))
+            elif error is not result:  # a job which could not be queried
+                output['error'] = error.get('errortext', 'failed')
+            return output
+
+        out = out or sys.stdout
+        errors = 0
+        requests = ((i, line) for i, line in enumerate(lines) if line.strip())
+        for output in self.pool.imap_unordered(run, requests):
+            if 'error' in output:
+                errors += 1
+            out.write(json.dumps(output) + '\n')
+            out.flush()
+        return errors
+
+
     def load_config(self, doc_str):
+        import docopt  # only when a CLI is created, to keep imports light
         args = docopt.docopt(doc_str)
 
         is_set = [
@@ -88,7 +162,7 @@ class CLI(API):
                 config = json.load(json_config)
 
         if config:
-            for key, value in config.iteritems():
+            for key, value in config.items():
                 if '--%s' % (key) not in is_set:
                     args['--%s' % (key)] = value
         return args
@@ -15,30 +15,85 @@
 # limitations under the License.
 
 import base64
+import collections
 import hmac
 import hashlib
+import io
 import json
 import os
 import pprint
 import requests
 import sys
+import threading
 import time
-import urllib
 import logging as _logging
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
+from .endpoints import EndpointPool, idempotent
+from .jobs import JobTracker
+from .ratelimit import TokenBucket
 
-class API(object):
+try:
+    from urllib import quote
+    from urlparse import urlparse
+except ImportError:  # python 3
+    from urllib.parse import quote, urlparse
+
+# number of quoted 'key=value' pairs kept to speed up signing, and the longest
+# pair kept (eg: a 'userdata' is not worth keeping)
+SIGN_CACHE_SIZE = 4096
+SIGN_CACHE_MAX_LENGTH = 256
+
+# number of bytes read at a time when looking for the records of a streamed response
+STREAM_CHUNK_SIZE = 8192
+
+def cs_quote(v):
+    if type(v) is list:
+        return quote(
+            str(",".join(v)).encode('utf-8'), safe=".-*_"
+        )
+    return quote(str(v).encode('utf-8'), safe=".-*_")
+
+class _Replay(object):
     """
-    Instantiate this class with the requred arguments, then use the 'request'
-    method to make calls to the CloudStack API.
+    A file like object which returns 'head' before reading the rest of 'raw',
+    'size' is the number of bytes read from 'raw'.
+    """
+    def __init__(self, head, raw):
+        self.head = head
+        self.raw = raw
+        self.size = 0
 
-    api = API(**args)
-    accounts = api.request({
-        'command':'listAccounts'
-    })
+    def read(self, size=-1):
+        if self.head and size != 0:
+            data, self.head = self.head, b''
+            return data
+        data = self.raw.read(size)
+        self.size += len(data)
+        return data
+
+def _floats(value):
     """
-    
+    Returns 'value' with the Decimals parsed by ijson converted to floats.
+    """
+    from decimal import Decimal
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, dict):
+        return dict((k, _floats(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return [_floats(v) for v in value]
+    return value
+
+class BaseAPI(object):
+    """
+    The parts shared by API and AsyncAPI: their settings, the signing of the
+    requests, the request hooks and the unwrapping of the responses.  See API
+    for the arguments.
+    """
+
     def __init__(
-            self, 
+            self,
             api_key,
             secret_key,
             endpoint="http://127.0.0.1:8080/client/api",
@@ -46,17 +101,66 @@ class API(object):
             logging=False,
             log="",
             clear_log=False,
-            async=False):
+            async_=False,
+            timeout=None,
+            retries=3,
+            backoff_factor=0.5,
+            retry_statuses=(429, 502, 503, 504),
+            pool_connections=10,
+            pool_maxsize=10,
+            keep_alive=True,
+            poll_min_interval=0.5,
+            job_timeout=None,
+            cache=None,
+            metrics=None,
+            balance='round_robin',
+            eject_after=3,
+            eject_for=30,
+            slow_threshold=None,
+            **kwargs):
+
+        # 'async' is a keyword since python 3.7, it can still be passed by name
+        # on older versions or with **{'async': True}
+        async_ = kwargs.pop('async', async_)
+        if kwargs:
+            raise TypeError("__init__() got an unexpected keyword argument '%s'" % (
+                list(kwargs.keys())[0]))
 
         self.api_key = api_key 
         self.secret_key = secret_key
         self.endpoint = endpoint
+        self.endpoints = EndpointPool(
+            endpoint,
+            balance=balance,
+            eject_after=eject_after,
+            eject_for=eject_for,
+            slow_threshold=slow_threshold
+        )
         self.poll_interval = poll_interval
         self.logging = logging
         self.log = log
         self.log_dir = os.path.dirname(self.log)
         self.clear_log = clear_log
-        self.async = async
+        setattr(self, 'async', async_)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.retry_statuses = retry_statuses
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+        self.poll_min_interval = poll_min_interval
+        self.job_timeout = job_timeout
+        self.cache = cache
+        self.metrics = metrics
+
+        # callables run around every HTTP call, as 'before(params, method)' and
+        # 'after(params, method, result, stats)' where 'stats' has the timings.
+        self.before_request = []
+        self.after_request = []
+
+        self._signer = None
+        self._quoted = {}
         
         if self.logging:
             if self.log_dir and not os.path.exists(self.log_dir):
@@ -76,87 +180,772 @@ class API(object):
 
 
     def sign(self, params):
-        def cs_quote(v):
-            if type(v) is list:
-                return urllib.quote(
-                    str(",".join(v)).encode('utf-8'), safe=".-*_"
-                )
-            return urllib.quote(str(v).encode('utf-8'), safe=".-*_")
+        """
+        Returns the signature of the request params.
+
+        :param params: the query parameters to be signed
+        :type params: dict
 
-        # build the query string
-        query = "&".join(sorted([
-            "=".join((k, cs_quote(v))).lower()
-            for k, v in params.items()
-        ]))
-        return base64.b64encode(
-            hmac.new(
-                self.secret_key.encode('utf-8'), 
-                query.encode('utf-8'), 
-                hashlib.sha1).digest()
-            ).decode('utf-8').strip()
+        :rtype: str
+        """
+        pairs = self._quoted
+        query = []
+        for k, v in params.items():
+            key = (k, v.__class__, v)
+            try:
+                pair = pairs[key]
+            except KeyError:
+                pair = "=".join((k, cs_quote(v))).lower()
+                if len(pair) <= SIGN_CACHE_MAX_LENGTH:
+                    if len(pairs) >= SIGN_CACHE_SIZE:
+                        pairs.clear()
+                    pairs[key] = pair
+            except TypeError:  # lists can not be cached
+                pair = "=".join((k, cs_quote(v))).lower()
+            query.append(pair)
+        query.sort()
+
+        # copying the keyed hmac is cheaper than creating a new one every time
+        signer = self._signer
+        if signer is None or signer[0] != self.secret_key:
+            signer = (self.secret_key, hmac.new(
+                self.secret_key.encode('utf-8'), digestmod=hashlib.sha1))
+            self._signer = signer
+        digest = signer[1].copy()
+        digest.update("&".join(query).encode('utf-8'))
+        return base64.b64encode(digest.digest()).decode('utf-8').strip()
 
 
-    def request(self, params, method=None):
+    def sign_many(self, param_list):
         """
-        Builds the request and returns a python dictionary of the result or None.
+        Returns the signature of each of the request params.
 
-        :param params: the query parameters to be sent to the server
-        :type params: dict
+        :param param_list: the query parameters of each request
+        :type param_list: list
 
-        :returns: the result of the request as a python dictionary
-        :rtype: dict or None
+        :rtype: list
+        """
+        sign = self.sign
+        return [sign(params) for params in param_list]
+
+
+    def _compact(self, result):
+        """
+        Returns the records of a list result as a RecordStore, other results
+        (errors, async job results...) are returned as they are.
+        """
+        if result is None or 'errorcode' in result:
+            return result
+        from .records import RecordStore
+        for key, value in result.items():
+            if key != 'count' and isinstance(value, list):
+                return RecordStore(value, count=result.get('count'))
+        return RecordStore() if not result else result
+
+
+    def _begin(self, params, method):
         """
+        Runs the 'before_request' hooks and signs the request.  Returns the
+        stats of the call, or None (once the 'after_request' hooks have seen the
+        failure) if the request can not be made.
+        """
+        for hook in self.before_request:
+            hook(params, method)
+
+        start = time.time()
+        ok = self._prepare(params)
+        stats = {'command': params.get('command', ''), 'sign': time.time() - start}
+        if not ok:
+            stats['error'] = 'invalid request'
+            self._observe(params, method, None, stats)
+            return None
+        return stats
+
+
+    def _error(self, status, result):
+        if result and 'errorcode' in result:
+            return result['errorcode']
+        if status >= 400:
+            return status
+        return None
 
+
+    def _observe(self, params, method, result, stats):
+        if self.metrics is not None:
+            self.metrics.observe(stats['command'], stats)
+        for hook in self.after_request:
+            hook(params, method, result, stats)
+
+
+    def _prepare(self, params):
+        """
+        Adds the common and signature params to a request, returns False if the
+        request can not be made.
+        """
         if self.api_key and self.secret_key and 'command' in params:
-            result = None
             params['response'] = 'json'
             params['apiKey'] = self.api_key
+            params.pop('signature', None)  # when the params are reused
             params['signature'] = self.sign(params)
+            return True
+        else:
+            print("ERROR: 'api_key', 'secret_key' and a request 'command' param are all required to use the api...")
+            return False
 
-            if method and method.upper() == 'POST':
-                response = requests.post(self.endpoint, data=params)
-            else:
-                response = requests.get(self.endpoint, params=params)
 
-            if response.ok:
-                result = response.json()
+    def _result(self, params, method, status, load, text, url):
+        """
+        Unwraps the '<command>response' of a completed HTTP request and logs it.
+        'load' and 'text' are called to decode the body only when it is needed.
+        """
+        result = None
+        ok = status < 400
+        if ok:
+            result = load()
+            result = result[(params['command']).lower()+'response']
+        elif self.logging:
+            if status == 431: #CS uses this for errors
+                result = load()
                 result = result[(params['command']).lower()+'response']
-            elif self.logging:
-                if response.status_code == 431: #CS uses this for errors
-                    result = response.json()
-                    result = result[(params['command']).lower()+'response']
-                self.logger.error(response.text)
+            self.logger.error(text())
 
-            if self.logging:
-                if method:
-                    self.logger.info("%s %s" % (method.upper(), response.url))
+        if self.logging:
+            # formatting the params and results is expensive, only do it when it is logged
+            debug = self.logger.isEnabledFor(_logging.DEBUG)
+            if method:
+                self.logger.info("%s %s", method.upper(), url)
+                if debug:
                     self.logger.debug(pprint.pformat(params))
-                else:
-                    self.logger.info("GET %s" % (response.url))
+            else:
+                self.logger.info("GET %s", url)
 
-                if response.ok:
-                    #pprint.pprint(response.headers, f, 2)  # if you want to log the headers too...
+            if ok:
+                #pprint.pprint(response.headers, f, 2)  # if you want to log the headers too...
+                if debug:
                     self.logger.debug(pprint.pformat(result))
-                else:
-                    self.logger.info(response.text)
+            else:
+                self.logger.info(text())
 
-                self.logger.info('\n\n\n')
+            self.logger.info('\n\n\n')
+        return result
 
-            # if the request was an async call, then poll for the result...
-            if not self.async and result and 'jobid' in result.keys() and \
-                    ('jobstatus' not in result.keys() or ('jobstatus' in result.keys() and result['jobstatus'] == 0)):
-                if self.logging:
-                     self.logger.info('polling...')
+class API(BaseAPI):
+    """
+    Instantiate this class with the requred arguments, then use the 'request'
+    method to make calls to the CloudStack API.
 
-                time.sleep(self.poll_interval)
-                result = self.request({
-                    'command':'queryAsyncJobResult',
-                    'jobId':result['jobid']
-                })
+    api = API(**args)
+    accounts = api.request({
+        'command':'listAccounts'
+    })
 
-                if result and 'jobstatus' in result and result['jobstatus'] == 1 and 'jobresult' in result:
-                    result = result['jobresult']
-            return result
-        else:
-            print("ERROR: 'api_key', 'secret_key' and a request 'command' param are all required to use the api...")
+    'endpoint' can also be a list of management servers, the requests are then
+    spread over them (see 'balance') and the servers which fail are skipped for a
+    while.  Since async jobs are stored in the shared database, their results can
+    be queried from any of the servers.
+
+    Connections are pooled and kept alive between calls, so a single instance
+    should be reused (it is safe to share across threads).  Use 'close' or a
+    'with' block to release the pooled connections when done.
+
+    with API(**args) as api:
+        accounts = api.request({
+            'command':'listAccounts'
+        })
+    """
+    
+    def __init__(
+            self, 
+            api_key,
+            secret_key,
+            endpoint="http://127.0.0.1:8080/client/api",
+            poll_interval=5,
+            logging=False,
+            log="",
+            clear_log=False,
+            async_=False,
+            timeout=None,
+            retries=3,
+            backoff_factor=0.5,
+            retry_statuses=(429, 502, 503, 504),
+            pool_connections=10,
+            pool_maxsize=10,
+            keep_alive=True,
+            poll_min_interval=0.5,
+            job_timeout=None,
+            batch_polls=False,
+            workers=None,
+            cache=None,
+            metrics=None,
+            balance='round_robin',
+            eject_after=3,
+            eject_for=30,
+            slow_threshold=None,
+            **kwargs):
+        super(API, self).__init__(
+            api_key,
+            secret_key,
+            endpoint=endpoint,
+            poll_interval=poll_interval,
+            logging=logging,
+            log=log,
+            clear_log=clear_log,
+            async_=async_,
+            timeout=timeout,
+            retries=retries,
+            backoff_factor=backoff_factor,
+            retry_statuses=retry_statuses,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            keep_alive=keep_alive,
+            poll_min_interval=poll_min_interval,
+            job_timeout=job_timeout,
+            cache=cache,
+            metrics=metrics,
+            balance=balance,
+            eject_after=eject_after,
+            eject_for=eject_for,
+            slow_threshold=slow_threshold,
+            **kwargs
+        )
+        self.batch_polls = batch_polls
+        self.workers = workers or self.pool_maxsize
+
+        self._jobs = None
+        self._adapter = None
+        self._local = threading.local()
+        self._pool = None
+        self._slots = {}
+        self._lock = threading.Lock()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    @property
+    def session(self):
+        """
+        The pooled 'requests.Session' used by the calling thread.
+        """
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            # one adapter (and so one connection pool) is shared by every thread,
+            # while each thread gets its own session to keep cookies/headers apart.
+            # the session is only held by the thread, it goes away with it.
+            with self._lock:
+                if self._adapter is None:
+                    self._adapter = HTTPAdapter(
+                        pool_connections=self.pool_connections,
+                        pool_maxsize=self.pool_maxsize,
+                        max_retries=Retry(
+                            total=self.retries,
+                            connect=self.retries,
+                            # the request may have been applied, do not replay it.  the
+                            # 'retry_statuses' of read only commands are retried by '_send'.
+                            read=0,
+                            status=0,
+                            backoff_factor=self.backoff_factor,
+                            raise_on_status=False
+                        ),
+                        pool_block=True
+                    )
+                adapter = self._adapter
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            if not self.keep_alive:
+                session.headers['Connection'] = 'close'
+            self._local.session = session
+        return session
+
+
+    def close(self):
+        """
+        Closes all the pooled connections.  The object can still be used after
+        being closed, new connections will simply be opened as needed.
+        """
+        # the sessions only hold the shared adapter, closing it closes them all
+        self._local = threading.local()
+        with self._lock:
+            adapter, self._adapter = self._adapter, None
+            pool, self._pool = self._pool, None
+            jobs = self._jobs
+        if jobs is not None:
+            jobs.close()
+        if adapter is not None:
+            adapter.close()
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+
+    @property
+    def jobs(self):
+        """
+        The JobTracker which resolves the async jobs, created on first use.  Jobs
+        are polled from a single background thread, backing off from
+        'poll_min_interval' up to 'poll_interval' between polls, in batches with
+        'batch_polls'.
+        """
+        with self._lock:
+            if self._jobs is None:
+                self._jobs = JobTracker(
+                    self,
+                    min_interval=self.poll_min_interval,
+                    max_interval=self.poll_interval,
+                    timeout=self.job_timeout,
+                    batch=self.batch_polls,
+                    workers=self.workers
+                )
+            return self._jobs
+
+
+    @property
+    def pool(self):
+        """
+        The worker threads used to run requests in the background, started on
+        first use.
+        """
+        with self._lock:
+            if self._pool is None:
+                from multiprocessing.pool import ThreadPool
+                self._pool = ThreadPool(self.workers)
+            return self._pool
+
+
+    def request(self, params, method=None, stream=False, fields=None, compact=False):
+        """
+        Builds the request and returns a python dictionary of the result or None.
+
+        :param params: the query parameters to be sent to the server
+        :type params: dict
+
+        :param stream: parse the response as it is downloaded and return a
+                       generator of the records in its list (requires 'ijson'),
+                       an error response raises a 'requests.HTTPError'
+        :type stream: bool
+
+        :param fields: when streaming, only keep these fields of each record.
+                       Each record is still parsed in full, this only reduces
+                       the memory held by the records which are kept.
+        :type fields: list or None
+
+        :param compact: return the records of a list response as a RecordStore,
+                        which takes a fraction of the memory of the dicts
+        :type compact: bool
+
+        :returns: the result of the request as a python dictionary
+        :rtype: dict or None
+        """
+        if stream:
+            records = self._stream(params, method, fields)
+            if compact:
+                from .records import RecordStore
+                return RecordStore(records)
+            return records
+
+        if self.cache is not None:
+            cached = self.cache.get(params, self.api_key)
+            if cached is not None:
+                return self._compact(cached) if compact else cached
+
+        result = self._call(params, method)
+
+        # if the request was an async call, then wait for the result...
+        if not getattr(self, 'async') and result and 'jobid' in result.keys() and \
+                result.get('jobstatus', 0) == 0:
+            start = time.time()
+            result = self.jobs.track(result).result()
+            if self.metrics is not None:
+                self.metrics.record(params['command'], 'poll', time.time() - start)
+
+        if self.cache is not None:
+            self.cache.set(params, result, self.api_key)
+        return self._compact(result) if compact else result
+
+
+    def submit(self, params, method=None):
+        """
+        Builds the request and returns a Job handle without waiting for an async
+        call to complete.  The job is resolved in the background, so many jobs can
+        be submitted and then waited on together.
+
+        :param params: the query parameters to be sent to the server
+        :type params: dict
+
+        :returns: a handle on the job, already resolved for non async calls
+        :rtype: Job
+        """
+        job = self.jobs.track(self._cached_call(params, method))
+        if self.cache is not None and not job.done() and not self.cache.cacheable(params):
+            # the results listed while the job ran may be out of date too
+            command = params['command']
+            job.add_done_callback(lambda job: self.cache.invalidate(command))
+        return job
+
+
+    def wait(self, jobs, timeout=None):
+        """
+        Waits for all the jobs to complete and returns their results in order.
+
+        :param jobs: the jobs returned by 'submit'
+        :type jobs: list
+
+        :param timeout: the maximum number of seconds to wait for all the jobs
+        :type timeout: float or None
+
+        :returns: the result of each job, None for the jobs still pending
+        :rtype: list
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+        return [
+            job.result(max(0, deadline - time.time()) if deadline else None)
+            for job in jobs
+        ]
+
+
+    def request_many(self, param_list, max_workers=None, rate=None, method=None):
+        """
+        Makes many requests concurrently and returns their results in the same
+        order as 'param_list'.  A failing call does not stop the others, the
+        exception it raised is returned in its place.
+
+        :param param_list: the query parameters of each request
+        :type param_list: list
+
+        :param max_workers: the number of concurrent requests, the 'workers' of
+                            the API object if None
+        :type max_workers: int or None
+
+        :param rate: the maximum number of requests started per second
+        :type rate: float or TokenBucket or None
+
+        :returns: the result (or exception) of each request
+        :rtype: list
+        """
+        if rate is not None and not isinstance(rate, TokenBucket):
+            rate = TokenBucket(rate)
+
+        def call(params):
+            try:
+                if rate is not None:
+                    rate.acquire()
+                return self.request(params, method)
+            except Exception as e:
+                return e
+
+        if max_workers is None:
+            return self.pool.map(call, param_list)
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(max_workers)
+        try:
+            return pool.map(call, param_list)
+        finally:
+            pool.close()
+            pool.join()
+
+
+    def iter_list(self, params, pagesize=500, prefetch=True, parallel=None, method=None):
+        """
+        Pages through the results of a 'list*' command and yields one record at a
+        time, so only a few pages are ever held in memory.
+
+        api.iter_list({
+            'command':'listVirtualMachines',
+            'listall':'true'
+        })
+
+        :param params: the query parameters to be sent to the server
+        :type params: dict
+
+        :param pagesize: the number of records to request per page
+        :type pagesize: int
+
+        :param prefetch: fetch the next page in the background while the current
+                         page is being consumed
+        :type prefetch: bool
+
+        :param parallel: the number of pages to fetch concurrently, using the
+                         'count' of the first page to know how many pages there are
+        :type parallel: int or None
+
+        :returns: a generator of the listed records
+        :rtype: generator
+        """
+        def fetch(page):
+            return self._cached_call(dict(params, page=page, pagesize=pagesize), method)
+
+        def records(result):
+            for key, value in (result or {}).items():
+                if key != 'count' and isinstance(value, list):
+                    return value
+            return []
+
+        result = fetch(1)
+        count = result.get('count') if result else None
+        last = -(-count // pagesize) if count else None  # ceil
+
+        # only fetch more than one page ahead when the number of pages is known
+        window = parallel if parallel and last else (1 if prefetch else 0)
+        pending = collections.deque()
+        page = 1
+        while True:
+            current = records(result)
+            full = len(current) >= pagesize
+            while len(pending) < window and full and (last is None or page + len(pending) < last):
+                pending.append(self.pool.apply_async(fetch, (page + len(pending) + 1,)))
+            for record in current:
+                yield record
+
+            if pending:
+                result = pending.popleft().get()
+            elif full:
+                # 'count' is not reliable for every command, keep going while pages are full
+                result = fetch(page + 1)
+            else:
+                return
+            page += 1
+
+
+    def _cached_call(self, params, method=None):
+        """
+        Makes a single API call, going through the cache like 'request' but
+        without waiting for async jobs.
+        """
+        if self.cache is None:
+            return self._call(params, method)
+        result = self.cache.get(params, self.api_key)
+        if result is None:
+            result = self._call(params, method)
+            self.cache.set(params, result, self.api_key)
+        return result
+
+
+    def _call(self, params, method=None):
+        """
+        Makes a single API call and returns the unwrapped response.
+        """
+        stats = self._begin(params, method)
+        if stats is None:
             return None
+
+        start = time.time()
+        try:
+            response = self._send(params, method, stats=stats)
+        except Exception as e:
+            stats.update(network=time.time() - start, error=e.__class__.__name__)
+            self._observe(params, method, None, stats)
+            raise
+        stats['network'] = time.time() - start
+
+        decode = []
+        def load():
+            start = time.time()
+            try:
+                return response.json()
+            finally:
+                decode.append(time.time() - start)
+
+        try:
+            result = self._result(
+                params, method, response.status_code, load,
+                lambda: response.text, response.url)
+        except Exception as e:
+            stats.update(status=response.status_code, decode=sum(decode),
+                error=e.__class__.__name__)
+            self._observe(params, method, None, stats)
+            raise
+
+        if self.metrics is not None or self.after_request:
+            stats.update(
+                status=response.status_code,
+                decode=sum(decode),
+                bytes_sent=len(response.request.url) + len(response.request.body or ''),
+                bytes_received=len(response.content),
+                error=self._error(response.status_code, result)
+            )
+            self._observe(params, method, result, stats)
+        return result
+
+
+    def _send(self, params, method=None, stream=False, stats=None):
+        """
+        Sends the request to one of the endpoints.  Read only requests which fail
+        with a connection error or a 5xx are sent again to another endpoint, and
+        are retried with a backoff when their status is in 'retry_statuses'.
+        Other requests may already have been applied when a response comes back
+        (eg: a 504 from a proxy), so they are only retried when they could not
+        connect.
+        """
+        safe = idempotent(params)
+        failovers = len(self.endpoints) - 1 if safe else 0
+        retries = self.retries if safe else 0
+        tried = []
+        while True:
+            endpoint = self.endpoints.acquire(exclude=tried)
+            tried.append(endpoint)
+            # wait for a free pooled connection before timing the endpoint, so
+            # the time spent queued is not taken for a slow server
+            slot = self._slot(endpoint.url)
+            slot.acquire()
+            start = time.time()
+            response = None
+            try:
+                if method and method.upper() == 'POST':
+                    response = self.session.post(
+                        endpoint.url, data=params, timeout=self.timeout, stream=stream)
+                else:
+                    response = self.session.get(
+                        endpoint.url, params=params, timeout=self.timeout, stream=stream)
+            except (requests.ConnectionError, requests.Timeout):
+                if not failovers:
+                    if stats is not None:
+                        stats['retries'] = len(tried) - 1
+                    raise
+                failovers -= 1
+                continue
+            finally:
+                slot.release()
+                self.endpoints.release(endpoint, time.time() - start,
+                    response is not None and response.status_code < 500)
+
+            ok = response.status_code < 500
+            if not ok and failovers:
+                if self.logging:
+                    self.logger.info("%s failed with %s, trying another endpoint",
+                        endpoint.url, response.status_code)
+                failovers -= 1
+            elif response.status_code in self.retry_statuses and retries:
+                if self.logging:
+                    self.logger.info("%s failed with %s, retrying",
+                        endpoint.url, response.status_code)
+                time.sleep(self.backoff_factor * (2 ** (self.retries - retries)))
+                retries -= 1
+            else:
+                if stats is not None:
+                    history = getattr(response.raw, 'retries', None)
+                    stats['retries'] = len(tried) - 1 + (len(history.history) if history else 0)
+                return response
+            response.close()
+
+
+    def _slot(self, url):
+        """
+        The semaphore which limits the requests in flight to the host of 'url'
+        to the size of its connection pool.
+        """
+        host = urlparse(url)[:2]  # scheme, netloc
+        with self._lock:
+            slot = self._slots.get(host)
+            if slot is None:
+                slot = self._slots[host] = threading.Semaphore(self.pool_maxsize)
+            return slot
+
+
+    def _stream(self, params, method=None, fields=None):
+        """
+        Makes a single API call and yields the records of the response list as
+        they are parsed from the body.  The hooks and metrics see the call once
+        the records are consumed, its 'decode' time covers reading and parsing
+        the body.
+        """
+        try:
+            import ijson
+        except ImportError:
+            raise ImportError("stream=True requires 'ijson': pip install csapi[stream]")
+
+        stats = self._begin(params, method)
+        if stats is None:
+            return
+
+        start = time.time()
+        try:
+            response = self._send(params, method, stream=True, stats=stats)
+        except Exception as e:
+            stats.update(network=time.time() - start, error=e.__class__.__name__)
+            self._observe(params, method, None, stats)
+            raise
+        stats['network'] = time.time() - start
+
+        root = params['command'].lower()+'response'
+        decode = 0
+        head = b''
+        body = None
+        try:
+            if not response.ok:
+                # errors are small, log them like any other request.  they are
+                # raised since an empty generator would look like an empty list.
+                result = self._result(
+                    params, method, response.status_code, response.json,
+                    lambda: response.text, response.url)
+                head = response.content
+                try:
+                    error = response.json()[root]
+                except (ValueError, KeyError, TypeError):
+                    error = {}
+                stats['error'] = self._error(response.status_code, result or error)
+                raise requests.HTTPError("%s %s: %s" % (
+                    response.status_code, response.reason,
+                    error.get('errortext', response.text)), response=response)
+            if self.logging:
+                self.logger.info("%s %s (streamed)",
+                    method.upper() if method else 'GET', response.url)
+
+            response.raw.decode_content = True
+
+            # parse the start of the body until the list of records is found
+            start = time.time()
+            item = None
+            while item is None:
+                chunk = response.raw.read(STREAM_CHUNK_SIZE)
+                head += chunk
+                try:
+                    for prefix, event, value in ijson.parse(io.BytesIO(head)):
+                        if event == 'start_array' and prefix.startswith(root + '.') and \
+                                prefix.count('.') == 1:
+                            item = prefix + '.item'
+                            break
+                except ijson.common.JSONError:
+                    pass  # the head is incomplete, read some more
+                if not chunk:
+                    break
+            decode += time.time() - start
+            if item is None:
+                return  # nothing is listed
+
+            body = _Replay(head, response.raw)
+            try:
+                # floats rather than Decimals, like the parsed 'request' results
+                records = iter(ijson.items(body, item, use_float=True))
+            except TypeError:  # ijson < 3.1
+                records = (_floats(record) for record in ijson.items(body, item))
+            while True:
+                # only time the parsing, not the consumer of the records
+                start = time.time()
+                try:
+                    record = next(records)
+                except StopIteration:
+                    break
+                finally:
+                    decode += time.time() - start
+                if fields is not None and isinstance(record, dict):
+                    record = dict((k, record[k]) for k in fields if k in record)
+                yield record
+        except Exception as e:
+            stats.setdefault('error', e.__class__.__name__)
+            raise
+        finally:
+            response.close()
+            stats.update(
+                status=response.status_code,
+                decode=decode,
+                bytes_sent=len(response.request.url) + len(response.request.body or ''),
+                bytes_received=len(head) + (body.size if body is not None else 0)
+            )
+            stats.setdefault('error', None)
+            self._observe(params, method, None, stats)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+
+# Author: Will Stevens (CloudOps) - wstevens@cloudops.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+
+ROUND_ROBIN = 'round_robin'
+LEAST_OUTSTANDING = 'least_outstanding'
+
+# commands which can safely be sent again to another management server
+IDEMPOTENT_PREFIXES = ('list', 'get', 'query')
+
+
+class Endpoint(object):
+    def __init__(self, url):
+        self.url = url
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0  # consecutive
+        self.latency = None  # moving average, in seconds
+        self.ejected_until = 0
+
+
+    def as_dict(self):
+        return {
+            'url': self.url,
+            'outstanding': self.outstanding,
+            'requests': self.requests,
+            'failures': self.failures,
+            'latency': self.latency,
+            'ejected': self.ejected_until > time.time()
+        }
+
+
+class EndpointPool(object):
+    """
+    Spreads the requests over several management servers, either in turn
+    ('round_robin') or to the server with the fewest requests in flight
+    ('least_outstanding').  A server is ejected for 'eject_for' seconds after
+    'eject_after' consecutive failures, or when its average latency goes over
+    'slow_threshold' seconds.  When every server is ejected, the one which is due
+    back first is used.
+    """
+
+    def __init__(self, urls, balance=ROUND_ROBIN, eject_after=3, eject_for=30, slow_threshold=None):
+        if isinstance(urls, (list, tuple)):
+            self.endpoints = [Endpoint(url) for url in urls]
+        else:
+            self.endpoints = [Endpoint(urls)]
+        if balance not in (ROUND_ROBIN, LEAST_OUTSTANDING):
+            raise ValueError("balance must be '%s' or '%s'" % (ROUND_ROBIN, LEAST_OUTSTANDING))
+        self.balance = balance
+        self.eject_after = eject_after
+        self.eject_for = eject_for
+        self.slow_threshold = slow_threshold
+        self._next = 0
+        self._lock = threading.Lock()
+
+
+    def __len__(self):
+        return len(self.endpoints)
+
+
+    def acquire(self, exclude=()):
+        """
+        Picks the endpoint of the next request, avoiding the 'exclude' endpoints
+        when possible.  Every 'acquire' must be followed by a 'release'.
+        """
+        with self._lock:
+            now = time.time()
+            candidates = [
+                e for e in self.endpoints
+                if e.ejected_until <= now and e not in exclude
+            ]
+            if not candidates:
+                candidates = [e for e in self.endpoints if e not in exclude] or self.endpoints
+                candidates = [min(candidates, key=lambda e: e.ejected_until)]
+
+            # rotate the candidates so ties are spread too
+            offset = self._next % len(candidates)
+            self._next += 1
+            candidates = candidates[offset:] + candidates[:offset]
+            if self.balance == LEAST_OUTSTANDING:
+                endpoint = min(candidates, key=lambda e: e.outstanding)
+            else:
+                endpoint = candidates[0]
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+
+    def release(self, endpoint, latency, ok):
+        """
+        Records the outcome of a request sent to 'endpoint'.
+        """
+        with self._lock:
+            endpoint.outstanding -= 1
+            if endpoint.ejected_until and endpoint.ejected_until <= time.time():
+                # back from a cooldown, start over
+                endpoint.ejected_until = 0
+                endpoint.latency = None
+
+            if ok:
+                endpoint.failures = 0
+                if endpoint.latency is None:
+                    endpoint.latency = latency
+                else:
+                    endpoint.latency = 0.8 * endpoint.latency + 0.2 * latency
+            else:
+                endpoint.failures += 1
+
+            if len(self.endpoints) > 1 and (
+                    endpoint.failures >= self.eject_after or (
+                        self.slow_threshold and endpoint.latency and
+                        endpoint.latency > self.slow_threshold)):
+                endpoint.ejected_until = time.time() + self.eject_for
+
+
+    def stats(self):
+        with self._lock:
+            return [e.as_dict() for e in self.endpoints]
+
+
+def idempotent(params):
+    return params.get('command', '').startswith(IDEMPOTENT_PREFIXES)
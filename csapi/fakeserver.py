@@ -0,0 +1,328 @@
+#!/usr/bin/env python
+
+# Author: Will Stevens (CloudOps) - wstevens@cloudops.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+A local stand-in for a CloudStack management server, used to test and benchmark
+the client without a real cloud.
+
+Usage:
+  fakeserver.py [options]
+  fakeserver.py (-h | --help)
+
+Options:
+  -h --help                 Show this screen.
+  --host=<arg>              Address to listen on [default: 127.0.0.1].
+  --port=<arg>              Port to listen on [default: 8080].
+  --api_key=<arg>           Api Key accepted by the server [default: key].
+  --secret_key=<arg>        Secret Key accepted by the server [default: secret].
+  --records=<arg>           Number of records returned by each 'list*' command [default: 1000].
+  --latency=<arg>           Seconds added to every response [default: 0].
+  --slow_latency=<arg>      Seconds added to the slow responses [default: 0].
+  --slow_ratio=<arg>        Fraction of the responses which are slow [default: 0].
+  --job_latency=<arg>       Seconds it takes for an async job to complete [default: 1].
+  --throttle=<arg>          Maximum number of requests per second, unlimited if 0 [default: 0].
+"""
+
+import json
+import random
+import threading
+import time
+from .csapi import API
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse, parse_qs
+except ImportError:  # python 3
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, parse_qs
+
+
+class FakeServer(object):
+    """
+    Serves a fake CloudStack API from a background thread.
+
+    with FakeServer(records=10000, job_latency=0.5) as server:
+        api = API(server.api_key, server.secret_key, server.endpoint)
+        vms = list(api.iter_list({
+            'command':'listVirtualMachines'
+        }))
+
+    Requests are signed with the same algorithm as 'API.sign' and checked
+    against the 'keys' ({api_key: secret_key}).  Commands starting with 'list'
+    return 'records' generated records, paged with 'page' and 'pagesize'.  Any
+    other command (except 'queryAsyncJobResult') starts an async job which
+    completes after 'job_latency' seconds.  Responses are delayed by 'latency'
+    seconds, plus 'slow_latency' seconds for a 'slow_ratio' fraction of them, and
+    requests over 'throttle' per second are refused with 'throttle_status'.
+
+    'GET /stats' returns the number of requests and of connections accepted.
+    """
+
+    def __init__(
+            self,
+            host='127.0.0.1',
+            port=0,
+            keys=None,
+            records=1000,
+            latency=0,
+            slow_latency=0,
+            slow_ratio=0,
+            job_latency=1,
+            throttle=None,
+            throttle_status=431):
+
+        self.keys = keys or {'key': 'secret'}
+        self.records = records
+        self.latency = latency
+        self.slow_latency = slow_latency
+        self.slow_ratio = slow_ratio
+        self.job_latency = job_latency
+        self.throttle = throttle
+        self.throttle_status = throttle_status
+
+        self.requests = 0
+        self.connections = 0
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._window = (0, 0)  # (second, requests in that second)
+        self._signers = dict(
+            (api_key, API(api_key, secret_key))
+            for api_key, secret_key in self.keys.items()
+        )
+
+        self.httpd = _HTTPServer((host, port), _Handler)
+        self.httpd.fake = self
+        self._thread = None
+
+
+    def __enter__(self):
+        return self.start()
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+    @property
+    def api_key(self):
+        return list(self.keys.keys())[0]
+
+
+    @property
+    def secret_key(self):
+        return self.keys[self.api_key]
+
+
+    @property
+    def endpoint(self):
+        host, port = self.httpd.server_address[:2]
+        return 'http://%s:%d/client/api' % (host, port)
+
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='csapi-fakeserver')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+
+    def stats(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'connections': self.connections,
+                'jobs': len(self.jobs)
+            }
+
+
+    def handle(self, params):
+        """
+        Returns the HTTP status and the JSON body of a request.
+        """
+        now = time.time()
+        with self._lock:
+            self.requests += 1
+            second, count = self._window
+            if int(now) != second:
+                second, count = int(now), 0
+            self._window = (second, count + 1)
+        command = params.get('command', '')
+        root = command.lower() + 'response'
+
+        if self.throttle and count >= self.throttle:
+            return self.throttle_status, {root: self._error(
+                self.throttle_status, 'The number of API requests is over the limit')}
+
+        signer = self._signers.get(params.get('apiKey'))
+        signed = dict((k, v) for k, v in params.items() if k != 'signature')
+        if signer is None or signer.sign(signed) != params.get('signature'):
+            return 401, {root: self._error(
+                401, 'unable to verify user credentials and/or request signature')}
+
+        delay = self.latency
+        if self.slow_ratio and random.random() < self.slow_ratio:
+            delay += self.slow_latency
+        if delay:
+            time.sleep(delay)
+
+        if command == 'queryAsyncJobResult':
+            job = self._job(params.get('jobId') or params.get('jobid'))
+            if job is None:
+                return 431, {root: self._error(431, 'Unable to find the job')}
+            return 200, {root: job}
+        if command == 'listAsyncJobs':
+            with self._lock:
+                jobids = list(self.jobs.keys())
+            return 200, {root: self._page(params, 'asyncjobs', [self._job(j) for j in jobids])}
+        if command.startswith('list'):
+            return 200, {root: self._page(params, self._resource(command), None)}
+
+        jobid = '%08x-0000-4000-8000-%012x' % (int(now), random.getrandbits(48))
+        with self._lock:
+            self.jobs[jobid] = (now + self.job_latency, command, params.get('id'))
+        return 200, {root: {'jobid': jobid, 'id': params.get('id', jobid)}}
+
+
+    def _page(self, params, key, items):
+        total = self.records if items is None else len(items)
+        pagesize = int(params.get('pagesize', 500))
+        page = int(params.get('page', 1))
+        start = (page - 1) * pagesize
+        stop = min(total, start + pagesize)
+        if start >= stop:
+            return {}
+        if items is None:
+            items = [self._record(key, i) for i in range(start, stop)]
+        else:
+            items = items[start:stop]
+        return {'count': total, key: items}
+
+
+    def _record(self, key, i):
+        return {
+            'id': '%08d-0000-4000-8000-%012d' % (i, i),
+            'name': '%s-%d' % (key, i),
+            'displayname': '%s %d' % (key, i),
+            'state': 'Running' if i % 7 else 'Stopped',
+            'account': 'account-%d' % (i % 50),
+            'domainid': 'domain-%d' % (i % 10),
+            'zoneid': 'zone-%d' % (i % 3),
+            'created': '2016-01-01T00:00:00+0000',
+            'nic': [{
+                'id': 'nic-%d' % i,
+                'ipaddress': '10.%d.%d.%d' % (i >> 16 & 255, i >> 8 & 255, i & 255),
+                'isdefault': True
+            }],
+            'tags': [{'key': 'index', 'value': str(i)}]
+        }
+
+
+    def _job(self, jobid):
+        with self._lock:
+            job = self.jobs.get(jobid)
+        if job is None:
+            return None
+        done_at, command, id_ = job
+        result = {'jobid': jobid, 'cmd': command, 'jobstatus': 0}
+        if time.time() >= done_at:
+            result['jobstatus'] = 1
+            result['jobresult'] = {self._resource(command): {'id': id_ or jobid}}
+        return result
+
+
+    def _resource(self, command):
+        # 'listVirtualMachines' -> 'virtualmachine'
+        name = command.lstrip('abcdefghijklmnopqrstuvwxyz').lower()
+        return name[:-1] if name.endswith('s') and command.startswith('list') else name
+
+
+    def _error(self, code, text):
+        return {'errorcode': code, 'errortext': text}
+
+
+class _HTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def handle_error(self, request, client_address):
+        pass  # eg: the client closed a streamed response early
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        fake = self.server.fake
+        with fake._lock:
+            fake.connections += 1
+
+
+    def log_message(self, format, *args):
+        pass
+
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/stats':
+            return self._send(200, self.server.fake.stats())
+
+        params = parse_qs(url.query, keep_blank_values=True)
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            params.update(parse_qs(
+                self.rfile.read(length).decode('utf-8'), keep_blank_values=True))
+        # repeated params are sent for lists, which are signed joined by ','
+        params = dict((k, ",".join(v)) for k, v in params.items())
+        self._send(*self.server.fake.handle(params))
+
+    do_POST = do_GET
+
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+if __name__ == '__main__':
+    import docopt
+    args = docopt.docopt(__doc__)
+    server = FakeServer(
+        host=args['--host'],
+        port=int(args['--port']),
+        keys={args['--api_key']: args['--secret_key']},
+        records=int(args['--records']),
+        latency=float(args['--latency']),
+        slow_latency=float(args['--slow_latency']),
+        slow_ratio=float(args['--slow_ratio']),
+        job_latency=float(args['--job_latency']),
+        throttle=int(args['--throttle']) or None
+    )
+    print("serving on %s" % server.endpoint)
+    server.httpd.serve_forever()
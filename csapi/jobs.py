@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+
+# Author: Will Stevens (CloudOps) - wstevens@cloudops.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
+PENDING = 0
+SUCCEEDED = 1
+FAILED = 2
+
+
+class Job(object):
+    """
+    A handle on a CloudStack async job.  It is returned by 'API.submit' and is
+    resolved in the background by the 'JobTracker' of the API object.
+
+    job = api.submit({
+        'command':'deployVirtualMachine',
+        ...
+    })
+    vm = job.result()
+    """
+
+    def __init__(self, jobid=None, response=None, timeout=None):
+        self.jobid = jobid
+        self.response = response
+        self.timed_out = False
+        self.deadline = time.time() + timeout if timeout else None
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+
+    @property
+    def status(self):
+        """
+        The last known 'jobstatus' of the job (0: pending, 1: success, 2: failure).
+        """
+        if self.response and 'jobstatus' in self.response:
+            return self.response['jobstatus']
+        return PENDING if self.jobid and not self.done() else None
+
+
+    def done(self):
+        return self._event.is_set()
+
+
+    def result(self, timeout=None):
+        """
+        Waits for the job to finish and returns its result.
+
+        :param timeout: the maximum number of seconds to wait, wait forever if None
+        :type timeout: float or None
+
+        :returns: the 'jobresult' of a successful job, the full query result of a
+                  failed (or timed out) job, or None if the job is still pending
+        :rtype: dict or None
+        """
+        if not self._event.wait(timeout):
+            return None
+        if self.status == SUCCEEDED and 'jobresult' in self.response:
+            return self.response['jobresult']
+        return self.response
+
+
+    def add_done_callback(self, fn):
+        """
+        Calls 'fn(job)' once the job is resolved (immediately if it already is).
+        """
+        with self._lock:
+            if not self.done():
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+
+    def _resolve(self, response, timed_out=False):
+        with self._lock:
+            if self.done():
+                return
+            if response is not None:
+                self.response = response
+            self.timed_out = timed_out
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            fn(self)
+
+
+class JobTracker(object):
+    """
+    Resolves the outstanding async jobs of an API object from a single
+    background thread.  The interval between polls starts at 'min_interval' and
+    doubles up to 'max_interval' while nothing changes, a newly tracked job is
+    polled after 'min_interval'.  The jobs are queried concurrently on up to
+    'workers' threads.  With 'batch', the status checks of the outstanding jobs
+    are batched into one 'listAsyncJobs' call per poll when more than one job is
+    pending.  Since that lists every recent job of the account, it only pays off
+    when many jobs are tracked at once.
+
+    A job which can not be queried (eg: it expired or is unknown to the server)
+    is resolved as failed, with the error (if any) as its 'jobresult'.
+    """
+
+    def __init__(self, api, min_interval=0.5, max_interval=5, timeout=None, batch=False, workers=10):
+        self.api = api
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.timeout = timeout
+        self.batch = batch
+        self.workers = workers
+        self._jobs = {}
+        self._added = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pool = None
+
+
+    def track(self, response):
+        """
+        Returns a Job for an async call response.  Responses without a pending
+        'jobid' are returned as an already resolved Job.
+
+        :param response: the result of an API call
+        :type response: dict or None
+
+        :rtype: Job
+        """
+        if not response or 'jobid' not in response or \
+                response.get('jobstatus', PENDING) != PENDING:
+            job = Job(response.get('jobid') if response else None, response)
+            job._resolve(response)
+            return job
+
+        job = Job(response['jobid'], response, self.timeout)
+        with self._cond:
+            self._jobs.setdefault(job.jobid, []).append(job)
+            self._added += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='csapi-jobs')
+                self._thread.daemon = True
+                self._thread.start()
+            else:
+                self._cond.notify()
+        return job
+
+
+    def pending(self):
+        with self._cond:
+            return len(self._jobs)
+
+
+    def close(self):
+        """
+        Stops the threads used to query the jobs, they are started again as needed.
+        """
+        with self._cond:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+
+    def _run(self):
+        try:
+            self._loop()
+        except BaseException:
+            # let 'track' start a new thread since this one died
+            with self._cond:
+                if self._thread is threading.current_thread():
+                    self._thread = None
+            raise
+
+
+    def _loop(self):
+        interval = self.min_interval
+        seen = 0
+        while True:
+            with self._cond:
+                deadline = time.time() + interval
+                while True:
+                    # the thread is only cleared while holding the lock, so 'track'
+                    # either adds its job before this check or starts a new thread
+                    if not self._jobs:
+                        self._thread = None
+                        return
+                    # poll new jobs quickly rather than at the backed off interval
+                    if self._added != seen:
+                        seen = self._added
+                        interval = self.min_interval
+                        deadline = min(deadline, time.time() + interval)
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                jobids = set(self._jobs.keys())
+
+            if self.api.logging:
+                self.api.logger.info('polling %d job(s)...', len(jobids))
+
+            resolved = 0
+            try:
+                resolved = self._poll(jobids)
+            except Exception as e:
+                # eg: a dropped connection, the jobs stay pending until the next poll
+                if self.api.logging:
+                    self.api.logger.error('polling %d job(s) failed: %s: %s',
+                        len(jobids), e.__class__.__name__, e)
+            self._expire()
+            if resolved:
+                interval = self.min_interval
+            else:
+                interval = min(interval * 2, self.max_interval)
+
+
+    def _poll(self, jobids):
+        results = {}
+        if self.batch and len(jobids) > 1:
+            # the jobs of the calling account, which are the ones it started
+            listing = self.api._call({
+                'command':'listAsyncJobs'
+            })
+            for entry in (listing or {}).get('asyncjobs', []):
+                # a finished job without its result still needs to be queried
+                if entry.get('jobid') in jobids and \
+                        (entry.get('jobstatus') == PENDING or 'jobresult' in entry):
+                    results[entry['jobid']] = entry
+
+        def query(jobid):
+            return jobid, self.api._call({
+                'command':'queryAsyncJobResult',
+                'jobId':jobid
+            })
+
+        queries = [jobid for jobid in jobids if jobid not in results]
+        if len(queries) > 1:
+            results.update(self._workers().map(query, queries))
+        else:
+            results.update(query(jobid) for jobid in queries)
+
+        resolved = 0
+        for jobid, result in results.items():
+            if not result or 'errorcode' in result:
+                # eg: 'Unable to find the job' once it expired, it will never complete
+                result = {
+                    'jobid': jobid,
+                    'jobstatus': FAILED,
+                    'jobresult': result or {'errortext': 'Unable to query the job'}
+                }
+            if result.get('jobstatus', PENDING) != PENDING:
+                resolved += self._finish(jobid, result)
+        return resolved
+
+
+    def _workers(self):
+        with self._cond:
+            if self._pool is None:
+                self._pool = ThreadPool(self.workers)
+            return self._pool
+
+
+    def _expire(self):
+        now = time.time()
+        with self._cond:
+            expired = [
+                job for jobs in self._jobs.values() for job in jobs
+                if job.deadline and job.deadline <= now
+            ]
+        for job in expired:
+            self._finish(job.jobid, None, job)
+
+
+    def _finish(self, jobid, result, job=None):
+        with self._cond:
+            jobs = self._jobs.pop(jobid, [])
+            if job is not None:
+                # only the given (timed out) handle is done, keep the others
+                if job in jobs:
+                    jobs.remove(job)
+                if jobs:
+                    self._jobs[jobid] = jobs
+                jobs = [job]
+        for j in jobs:
+            j._resolve(result, timed_out=result is None)
+        return len(jobs)
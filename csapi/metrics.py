@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+
+# Author: Will Stevens (CloudOps) - wstevens@cloudops.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+
+# upper bounds, in seconds, of the latency histogram buckets
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+# the phases of a request which are timed
+PHASES = ('sign', 'network', 'decode', 'poll')
+
+
+class Histogram(object):
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+    def as_dict(self):
+        cumulative = 0
+        buckets = []
+        for bound, count in zip(list(self.buckets) + ['+Inf'], self.counts):
+            cumulative += count
+            buckets.append((bound, cumulative))
+        return {'buckets': buckets, 'sum': self.sum, 'count': self.count}
+
+
+class Metrics(object):
+    """
+    Collects per command call, error, retry, byte and latency statistics, pass
+    it to the API object with the 'metrics' argument.
+
+    api = API(api_key, secret_key, metrics=Metrics())
+    ...
+    api.metrics.as_dict()['listVirtualMachines']['calls']
+    print(api.metrics.prometheus())
+
+    The latency is split in phases: 'sign' (building and signing the request),
+    'network' (sending it and downloading the response), 'decode' (parsing the
+    JSON response) and 'poll' (waiting for an async job to complete).
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._commands = {}
+        self._lock = threading.Lock()
+
+
+    def observe(self, command, stats):
+        """
+        Records an API call, 'stats' is the dictionary passed to the
+        'after_request' hooks.
+        """
+        with self._lock:
+            entry = self._entry(command)
+            entry['calls'] += 1
+            if stats.get('error'):
+                entry['errors'] += 1
+            entry['retries'] += stats.get('retries', 0)
+            entry['bytes_sent'] += stats.get('bytes_sent', 0)
+            entry['bytes_received'] += stats.get('bytes_received', 0)
+            for phase in PHASES:
+                if phase in stats:
+                    entry['latency'][phase].observe(stats[phase])
+
+
+    def record(self, command, phase, seconds):
+        """
+        Records the duration of a single phase of a command.
+        """
+        with self._lock:
+            self._entry(command)['latency'][phase].observe(seconds)
+
+
+    def reset(self):
+        with self._lock:
+            self._commands = {}
+
+
+    def as_dict(self):
+        with self._lock:
+            return dict(
+                (command, dict(
+                    entry,
+                    latency=dict(
+                        (phase, histogram.as_dict())
+                        for phase, histogram in entry['latency'].items()
+                        if histogram.count
+                    )
+                ))
+                for command, entry in self._commands.items()
+            )
+
+
+    def prometheus(self, prefix='csapi'):
+        """
+        Returns the metrics in the Prometheus text exposition format.
+        """
+        metrics = self.as_dict()
+        lines = []
+        for name, key, kind, help_ in (
+                ('requests_total', 'calls', 'counter', 'Number of API calls.'),
+                ('errors_total', 'errors', 'counter', 'Number of failed API calls.'),
+                ('retries_total', 'retries', 'counter', 'Number of retried HTTP requests.'),
+                ('sent_bytes_total', 'bytes_sent', 'counter', 'Bytes sent to the API.'),
+                ('received_bytes_total', 'bytes_received', 'counter', 'Bytes received from the API.')):
+            lines.append('# HELP %s_%s %s' % (prefix, name, help_))
+            lines.append('# TYPE %s_%s %s' % (prefix, name, kind))
+            for command in sorted(metrics):
+                lines.append('%s_%s{command="%s"} %s' % (
+                    prefix, name, command, metrics[command][key]))
+
+        name = '%s_latency_seconds' % prefix
+        lines.append('# HELP %s Latency of the phases of the API calls.' % name)
+        lines.append('# TYPE %s histogram' % name)
+        for command in sorted(metrics):
+            for phase, histogram in sorted(metrics[command]['latency'].items()):
+                labels = 'command="%s",phase="%s"' % (command, phase)
+                for bound, count in histogram['buckets']:
+                    lines.append('%s_bucket{%s,le="%s"} %d' % (name, labels, bound, count))
+                lines.append('%s_sum{%s} %s' % (name, labels, repr(histogram['sum'])))
+                lines.append('%s_count{%s} %d' % (name, labels, histogram['count']))
+        return '\n'.join(lines) + '\n'
+
+
+    def _entry(self, command):
+        entry = self._commands.get(command)
+        if entry is None:
+            entry = {
+                'calls': 0,
+                'errors': 0,
+                'retries': 0,
+                'bytes_sent': 0,
+                'bytes_received': 0,
+                'latency': dict((phase, Histogram(self.buckets)) for phase in PHASES)
+            }
+            self._commands[command] = entry
+        return entry
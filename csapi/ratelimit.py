@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+
+# Author: Will Stevens (CloudOps) - wstevens@cloudops.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+
+
+class TokenBucket(object):
+    """
+    A thread safe token bucket which caps the number of requests per second.
+    Pass the same instance to several 'request_many' calls to share the cap.
+
+    bucket = TokenBucket(rate=20, burst=5)
+    bucket.acquire()  # blocks until a request is allowed
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        if self.rate <= 0:
+            raise ValueError("rate must be greater than 0")
+        self.burst = burst or max(1, int(self.rate))
+        self._tokens = float(self.burst)
+        self._last = time.time()
+        self._lock = threading.Lock()
+
+
+    def delay(self):
+        """
+        Takes a token and returns the number of seconds to wait before using it.
+        """
+        with self._lock:
+            now = time.time()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= 1
+            return max(0, -self._tokens / self.rate)
+
+
+    def acquire(self):
+        """
+        Blocks until a token is available.
+        """
+        wait = self.delay()
+        if wait:
+            time.sleep(wait)
@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+
+# Author: Will Stevens (CloudOps) - wstevens@cloudops.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+from decimal import Decimal
+
+# the fields indexed by default, if the records have them
+INDEXES = ('id', 'zoneid', 'account')
+
+# a field stops sharing its values between records once it has this many distinct values
+SHARED_VALUES = 1024
+
+_MISSING = object()
+
+
+def _json_default(value):
+    # eg: the Decimals of records parsed by ijson without 'use_float'
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError("%r is not JSON serializable" % (value,))
+
+
+class Schema(object):
+    """
+    The field names shared by all the records of a store, each record only
+    holds a tuple of values in this order.  Fields are appended as they are
+    seen, so older records may have fewer values.
+    """
+
+    def __init__(self):
+        self.fields = []
+        self.positions = {}
+        self.shared = []  # per field, its distinct values or None
+
+
+    def position(self, field):
+        position = self.positions.get(field)
+        if position is None:
+            position = len(self.fields)
+            self.fields.append(field)
+            self.positions[field] = position
+            self.shared.append({})
+        return position
+
+
+    def share(self, position, value):
+        """
+        Returns the copy of 'value' already held by another record, so the
+        repeated values of a field (eg: 'state', 'zonename') are stored once.
+        """
+        shared = self.shared[position]
+        if shared is None:
+            return value
+        key = (value.__class__, value)  # 1, 1.0 and True are equal
+        try:
+            return shared[key]
+        except KeyError:
+            if len(shared) >= SHARED_VALUES:
+                self.shared[position] = None  # too many distinct values
+            else:
+                shared[key] = value
+            return value
+
+
+class Record(object):
+    """
+    A read only, dict like record.  Nested values (lists and dicts, eg: 'nic' or
+    'tags') are kept as JSON and decoded each time they are accessed.
+    """
+    __slots__ = ('_schema', '_values', '_nested')
+
+    def __init__(self, schema, values, nested):
+        self._schema = schema
+        self._values = values
+        self._nested = nested  # bit mask of the positions holding JSON
+
+
+    def __getitem__(self, field):
+        value = self.get(field, _MISSING)
+        if value is _MISSING:
+            raise KeyError(field)
+        return value
+
+
+    def get(self, field, default=None):
+        position = self._schema.positions.get(field)
+        if position is None or position >= len(self._values):
+            return default
+        value = self._values[position]
+        if value is _MISSING:
+            return default
+        if self._nested >> position & 1:
+            return json.loads(value)
+        return value
+
+
+    def __contains__(self, field):
+        return self.get(field, _MISSING) is not _MISSING
+
+
+    def __iter__(self):
+        return iter(self.keys())
+
+
+    def __len__(self):
+        return len(self.keys())
+
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+
+    def __ne__(self, other):
+        return not self == other
+
+
+    def __repr__(self):
+        return 'Record(%r)' % self.to_dict()
+
+
+    def keys(self):
+        fields = self._schema.fields
+        return [
+            fields[i] for i, value in enumerate(self._values)
+            if value is not _MISSING
+        ]
+
+
+    def items(self):
+        return [(field, self[field]) for field in self.keys()]
+
+
+    def values(self):
+        return [self[field] for field in self.keys()]
+
+
+    def to_dict(self):
+        return dict(self.items())
+
+
+class RecordStore(object):
+    """
+    A compact in-memory store for the records of a list response.  Instead of a
+    dict per record, the field names are shared by every record, nested values
+    are kept as JSON strings until they are accessed and the repeated values of a
+    field are stored once.  The indexed fields can be looked up without scanning
+    the records.
+
+    vms = api.request({
+        'command':'listVirtualMachines',
+        'listall':'true'
+    }, compact=True)
+    vm = vms.get(vm_id)
+    running = vms.filter(zoneid=zone_id, state='Running')
+    by_account = vms.index('account')
+
+    Any iterable of dicts can be stored, eg: RecordStore(api.iter_list(params)).
+    """
+
+    def __init__(self, records=(), indexes=INDEXES, count=None):
+        self.schema = Schema()
+        self.count = count
+        self._records = []
+        self._indexes = dict((field, {}) for field in indexes)
+        self.extend(records)
+
+
+    def __len__(self):
+        return len(self._records)
+
+
+    def __iter__(self):
+        return iter(self._records)
+
+
+    def __getitem__(self, i):
+        return self._records[i]
+
+
+    def __repr__(self):
+        return 'RecordStore(%d records)' % len(self._records)
+
+
+    def add(self, record):
+        """
+        Adds a record (a dict) to the store and returns it as a Record.
+        """
+        schema = self.schema
+        values = []
+        nested = 0
+        for field, value in record.items():
+            position = schema.position(field)
+            if position >= len(values):
+                values.extend([_MISSING] * (position - len(values) + 1))
+            if isinstance(value, (dict, list)):
+                value = json.dumps(value, separators=(',', ':'), default=_json_default)
+                nested |= 1 << position
+            values[position] = schema.share(position, value)
+
+        position = len(self._records)
+        for field, index in self._indexes.items():
+            i = schema.positions.get(field)
+            if i is None or i >= len(values) or values[i] is _MISSING or nested >> i & 1:
+                continue
+            index.setdefault(values[i], []).append(position)
+
+        entry = Record(schema, tuple(values), nested)
+        self._records.append(entry)
+        return entry
+
+
+    def extend(self, records):
+        for record in records:
+            self.add(record)
+
+
+    def get(self, id, default=None):
+        """
+        Returns the record with this 'id'.
+        """
+        return self.lookup('id', id, [default])[0]
+
+
+    def lookup(self, field, value, default=()):
+        """
+        Returns the records whose 'field' is 'value'.
+        """
+        index = self._indexes.get(field)
+        if index is None:
+            return [r for r in self._records if r.get(field, _MISSING) == value] or list(default)
+        positions = index.get(value)
+        if positions is None:
+            return list(default)
+        return [self._records[i] for i in positions]
+
+
+    def filter(self, **criteria):
+        """
+        Returns the records matching all the 'field=value' criteria, the indexed
+        fields are used to narrow down the records which are scanned.
+        """
+        candidates = None
+        for field, value in criteria.items():
+            index = self._indexes.get(field)
+            if index is not None:
+                positions = set(index.get(value, ()))
+                candidates = positions if candidates is None else candidates & positions
+        if candidates is None:
+            records = self._records
+        else:
+            records = [self._records[i] for i in sorted(candidates)]
+
+        return [
+            r for r in records
+            if all(r.get(field, _MISSING) == value for field, value in criteria.items())
+        ]
+
+
+    def index(self, field):
+        """
+        Returns a dict of the records by their value of 'field', eg: to join
+        the records of several commands.
+        """
+        index = self._indexes.get(field)
+        if index is None:
+            index = {}
+            for i, record in enumerate(self._records):
+                value = record.get(field, _MISSING)
+                if value is not _MISSING and not isinstance(value, (dict, list)):
+                    index.setdefault(value, []).append(i)
+            self._indexes[field] = index
+        return dict(
+            (value, [self._records[i] for i in positions])
+            for value, positions in index.items()
+        )
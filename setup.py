@@ -27,4 +27,13 @@ setup(
     packages=find_packages(exclude=['docs', 'tests*']),
 
     install_requires=['requests', 'docopt'],
+    entry_points={
+        'console_scripts': ['csapi=csapi.__main__:main'],
+    },
+
+    extras_require={
+        'async': ['aiohttp'],
+        'stream': ['ijson'],
+        'test': ['pytest', 'ijson'],
+    },
 )
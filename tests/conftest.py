@@ -0,0 +1,27 @@
+import sys
+
+import pytest
+
+from csapi import API
+from csapi.fakeserver import FakeServer
+
+# the AsyncAPI tests use the 'async def' syntax
+collect_ignore = [] if sys.version_info >= (3, 5) else ['test_aio.py']
+
+
+@pytest.fixture
+def server():
+    with FakeServer(records=250, job_latency=0.1) as server:
+        yield server
+
+
+@pytest.fixture
+def api(server):
+    with API(
+            server.api_key,
+            server.secret_key,
+            server.endpoint,
+            poll_min_interval=0.02,
+            poll_interval=0.1,
+            backoff_factor=0.01) as api:
+        yield api
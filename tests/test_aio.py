@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from csapi import API
+from csapi.aio import AsyncAPI
+from csapi.fakeserver import FakeServer
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_request(server):
+    async def main():
+        async with AsyncAPI(server.api_key, server.secret_key, server.endpoint,
+                poll_min_interval=0.02, poll_interval=0.1) as api:
+            return await api.request_many([
+                {'command': 'listZones', 'pagesize': 1},
+                {'command': 'stopVirtualMachine', 'id': 'vm-1'}
+            ])
+
+    zones, stopped = run(main())
+    assert zones['count'] == 250
+    assert stopped == {'virtualmachine': {'id': 'vm-1'}}
+
+
+def test_sync_only_methods(server):
+    api = AsyncAPI(server.api_key, server.secret_key, server.endpoint)
+    assert not isinstance(api, API)
+    for name in ('submit', 'wait', 'iter_list', 'jobs', 'pool', 'session', '_cached_call'):
+        assert not hasattr(api, name)
+    with pytest.raises(TypeError):
+        AsyncAPI(server.api_key, server.secret_key, workers=4)
+
+
+def test_lost_jobs_return(server):
+    async def main(api):
+        async with api:
+            return await api.request({'command': 'stopVirtualMachine', 'id': 'vm-1'})
+
+    api = AsyncAPI(server.api_key, server.secret_key, server.endpoint,
+        poll_min_interval=0.02, poll_interval=0.1)
+    api.after_request.append(lambda params, method, result, stats: server.jobs.clear())
+    assert run(main(api)) is None
+
+
+def test_timeouts_release_the_endpoints():
+    async def main(api):
+        async with api:
+            return await api.request_many([{'command': 'listZones'} for _ in range(6)])
+
+    with FakeServer(latency=0.5) as slow:
+        api = AsyncAPI(slow.api_key, slow.secret_key,
+            [slow.endpoint, slow.endpoint.replace('127.0.0.1', 'localhost')],
+            timeout=0.1, retries=0)
+        results = run(main(api))
+    assert all(isinstance(r, Exception) for r in results)
+    stats = api.endpoints.stats()
+    assert [s['outstanding'] for s in stats] == [0, 0]
+    assert all(s['failures'] for s in stats)
+
+
+def test_queued_time_is_not_latency():
+    async def main(api):
+        async with api:
+            return await api.request_many([{'command': 'listZones', 'pagesize': 1} for _ in range(40)])
+
+    with FakeServer(latency=0.05) as server:
+        api = AsyncAPI(server.api_key, server.secret_key,
+            [server.endpoint, server.endpoint.replace('127.0.0.1', 'localhost')],
+            pool_maxsize=2, slow_threshold=0.2)
+        results = run(main(api))
+    assert all(r['count'] == 1000 for r in results)
+    assert not any(s['ejected'] for s in api.endpoints.stats())
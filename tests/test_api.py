@@ -0,0 +1,128 @@
+import base64
+import gc
+import hashlib
+import hmac
+import threading
+import weakref
+
+import pytest
+
+from csapi import API
+from csapi.fakeserver import FakeServer
+
+try:
+    from urllib import quote
+except ImportError:  # python 3
+    from urllib.parse import quote
+
+
+class FlakyServer(FakeServer):
+    """
+    Fails the first 'failures' calls of each command with 'status'.
+    """
+
+    def __init__(self, failures=2, status=504, **kwargs):
+        FakeServer.__init__(self, **kwargs)
+        self.failures = failures
+        self.status = status
+        self.calls = {}
+
+    def handle(self, params):
+        command = params.get('command')
+        with self._lock:
+            self.calls[command] = self.calls.get(command, 0) + 1
+            calls = self.calls[command]
+        if calls <= self.failures:
+            return self.status, {command.lower() + 'response': {}}
+        return FakeServer.handle(self, params)
+
+
+def test_connections_are_reused(api, server):
+    for _ in range(5):
+        api.request({'command': 'listZones', 'pagesize': 1})
+    assert server.stats()['connections'] == 1
+
+
+def test_sessions_end_with_their_thread(api):
+    sessions = []
+
+    def run():
+        api.request({'command': 'listZones', 'pagesize': 1})
+        sessions.append(weakref.ref(api.session))
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    gc.collect()
+    assert len(sessions) == 4
+    assert [s() for s in sessions] == [None] * 4
+    assert api.request({'command': 'listZones', 'pagesize': 1})['count'] == 250
+
+
+def test_retries_read_only_commands():
+    with FlakyServer(failures=2, status=503) as server:
+        api = API(server.api_key, server.secret_key, server.endpoint, backoff_factor=0.01)
+        assert api.request({'command': 'listZones', 'pagesize': 1})['count'] == 1000
+        assert server.calls['listZones'] == 3
+
+
+def test_does_not_replay_other_commands():
+    with FlakyServer(failures=2, status=504) as server:
+        api = API(server.api_key, server.secret_key, server.endpoint, backoff_factor=0.01)
+        api.request({'command': 'deployVirtualMachine', 'zoneid': 'z'})
+        assert server.calls['deployVirtualMachine'] == 1
+
+
+def test_iter_list(api):
+    for parallel in (None, 3):
+        records = list(api.iter_list(
+            {'command': 'listVirtualMachines'}, pagesize=40, parallel=parallel))
+        assert len(records) == 250
+        assert len(set(r['id'] for r in records)) == 250
+
+
+def test_iter_list_stops_early(api, server):
+    records = api.iter_list({'command': 'listVirtualMachines'}, pagesize=10, prefetch=False)
+    assert [next(records)['name'] for _ in range(3)] == ['virtualmachine-%d' % i for i in range(3)]
+    records.close()
+    assert server.stats()['requests'] == 1
+
+
+def test_async_keyword(server):
+    api = API(server.api_key, server.secret_key, server.endpoint, **{'async': True})
+    result = api.request({'command': 'stopVirtualMachine', 'id': 'vm-1'})
+    assert 'jobid' in result
+    with pytest.raises(TypeError):
+        API('key', 'secret', unknown=True)
+
+
+def test_request_many(api):
+    params = [{'command': 'listZones', 'page': i + 1, 'pagesize': 1} for i in range(20)]
+    params.append({'command': 'listZones', 'pagesize': 'not a number'})
+    results = api.request_many(params, max_workers=4, rate=1000)
+    assert [r['zone'][0]['name'] for r in results[:20]] == ['zone-%d' % i for i in range(20)]
+    assert isinstance(results[20], Exception)
+
+
+def test_sign():
+    api = API('key', 'secret')
+    params = {'command': 'listZones', 'name': 'a b/c', 'apiKey': 'key', 'response': 'json'}
+    query = "&".join(sorted(
+        "%s=%s" % (k, quote(v, safe=".-*_")) for k, v in params.items()
+    )).lower()
+    expected = base64.b64encode(hmac.new(
+        b'secret', query.encode('utf-8'), hashlib.sha1).digest()).decode('utf-8')
+    assert api.sign(params) == expected
+    assert api.sign(params) == expected  # from the memoized pairs
+    assert api.sign_many([params, params]) == [expected, expected]
+
+
+def test_sign_does_not_keep_long_values():
+    api = API('key', 'secret')
+    userdata = 'x' * 32768
+    first = api.sign({'command': 'deployVirtualMachine', 'userdata': userdata})
+    assert first == api.sign({'command': 'deployVirtualMachine', 'userdata': userdata})
+    assert ('command', str, 'deployVirtualMachine') in api._quoted
+    assert not [key for key in api._quoted if key[0] == 'userdata']
@@ -0,0 +1,85 @@
+import os
+import stat
+
+from csapi import API, ResponseCache
+
+
+def test_cache(api, server):
+    api.cache = ResponseCache(ttl=60)
+    params = {'command': 'listVirtualMachines', 'pagesize': 1}
+    first = api.request(dict(params))
+    requests = server.stats()['requests']
+    assert api.request(dict(params)) == first
+    assert server.stats()['requests'] == requests
+    assert api.cache.stats()['hits'] == 1
+
+    # a command on the same resource evicts it
+    api.request({'command': 'stopVirtualMachine', 'id': '1'})
+    api.request(dict(params))
+    assert api.cache.stats()['hits'] == 1
+
+
+def test_submit_invalidates(api):
+    api.cache = ResponseCache(ttl=60)
+    params = {'command': 'listVirtualMachines', 'pagesize': 1}
+    api.request(dict(params))
+    api.submit({'command': 'stopVirtualMachine', 'id': '1'}).result(5)
+    api.request(dict(params))
+    assert api.cache.stats()['hits'] == 0
+
+
+def test_iter_list_is_cached(api, server):
+    api.cache = ResponseCache(ttl=60)
+    list(api.iter_list({'command': 'listZones'}, pagesize=100))
+    requests = server.stats()['requests']
+    assert len(list(api.iter_list({'command': 'listZones'}, pagesize=100))) == 250
+    assert server.stats()['requests'] == requests
+
+
+def test_disk_cache_is_scoped_by_key(tmpdir, server):
+    path = str(tmpdir)
+    api = API(server.api_key, server.secret_key, server.endpoint,
+        cache=ResponseCache(path=path))
+    api.request({'command': 'listZones', 'pagesize': 1})
+
+    shared = API(server.api_key, server.secret_key, server.endpoint,
+        cache=ResponseCache(path=path))
+    assert shared.cache.get({'command': 'listZones', 'pagesize': 1}, server.api_key)
+
+    other = API('other', 'secret', server.endpoint, cache=ResponseCache(path=path))
+    assert other.request({'command': 'listZones', 'pagesize': 1}) is None
+
+
+def test_disk_cache_is_private(tmpdir, server):
+    path = os.path.join(str(tmpdir), 'cache')
+    api = API(server.api_key, server.secret_key, server.endpoint,
+        cache=ResponseCache(path=path))
+    api.request({'command': 'listZones', 'pagesize': 1})
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o700
+    names = os.listdir(path)
+    assert len(names) == 1
+    assert stat.S_IMODE(os.stat(os.path.join(path, names[0])).st_mode) == 0o600
+
+
+def test_credentials_are_not_cached():
+    cache = ResponseCache()
+    for command in ('getUserKeys', 'getVMPassword', 'listUsers'):
+        params = {'command': command, 'id': '1'}
+        cache.set(params, {'userkeys': {'secretkey': 'secret'}})
+        assert cache.get(params) is None
+    assert cache.stats()['size'] == 0
+
+    cache = ResponseCache(exclude=())
+    cache.set({'command': 'listUsers'}, {'user': []})
+    assert cache.get({'command': 'listUsers'}) == {'user': []}
+
+
+def test_invalidate_plurals():
+    cache = ResponseCache()
+    cache.set({'command': 'listSnapshotPolicies'}, {'snapshotpolicy': []})
+    cache.set({'command': 'listVirtualMachines'}, {'virtualmachine': []})
+    cache.invalidate('updateSnapshotPolicy')
+    assert cache.get({'command': 'listSnapshotPolicies'}) is None
+    assert cache.get({'command': 'listVirtualMachines'}) is not None
+    cache.invalidate('addNicToVirtualMachine')
+    assert cache.get({'command': 'listVirtualMachines'}) is None
@@ -0,0 +1,59 @@
+import io
+import json
+import sys
+
+import pytest
+
+import csapi.__main__
+from csapi import CLI
+
+
+@pytest.fixture
+def argv(monkeypatch, server):
+    def set_argv(*args):
+        monkeypatch.setattr(sys, 'argv', [
+            'csapi',
+            '--api_key=%s' % server.api_key,
+            '--secret_key=%s' % server.secret_key,
+            '--endpoint=%s' % server.endpoint,
+            '--poll_interval=0.1'
+        ] + list(args))
+    return set_argv
+
+
+def test_run_batch(argv):
+    argv('--parallel=20')
+    api = CLI(csapi.__main__.__doc__)
+    assert (api.workers, api.pool_maxsize) == (20, 20)
+
+    out = io.StringIO()
+    errors = api.run_batch([
+        '{"command": "listZones", "pagesize": 1}\n',
+        'not json\n',
+        '\n',
+        '{"command": "stopVirtualMachine", "id": "vm-1"}\n',
+        '{"command": "queryAsyncJobResult", "jobId": "unknown"}\n'
+    ], out)
+    api.close()
+    assert errors == 2
+
+    results = dict((r['index'], r) for r in map(json.loads, out.getvalue().splitlines()))
+    assert sorted(results) == [0, 1, 3, 4]
+    assert results[0]['result']['count'] == 250 and 'error' not in results[0]
+    assert 'Error' in results[1]['error']  # JSONDecodeError or ValueError
+    assert results[3]['result'] == {'virtualmachine': {'id': 'vm-1'}}
+    assert results[4]['result'] is None and results[4]['error'].startswith('no result')
+
+
+def test_main(argv, tmpdir, capsys):
+    batch = tmpdir.join('batch.json')
+    batch.write('{"command": "listZones", "pagesize": 1}\n' * 3)
+    argv('--batch=%s' % batch)
+    assert csapi.__main__.main() == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 3
+
+    batch.write('{"command": "listZones", "pagesize": 1}\nnot json\n')
+    assert csapi.__main__.main() == 1
+    errors = [json.loads(l).get('error') for l in capsys.readouterr().out.splitlines()]
+    assert len(errors) == 2 and errors.count(None) == 1
@@ -0,0 +1,49 @@
+import pytest
+import requests
+
+from csapi import API, EndpointPool
+from csapi.fakeserver import FakeServer
+
+
+def test_balance():
+    pool = EndpointPool(['a', 'b'])
+    assert [pool.acquire().url for _ in range(4)] == ['a', 'b', 'a', 'b']
+
+    pool = EndpointPool(['a', 'b'], balance='least_outstanding')
+    a = pool.acquire()
+    assert pool.acquire().url != a.url
+    with pytest.raises(ValueError):
+        EndpointPool(['a'], balance='random')
+
+
+def test_ejection():
+    pool = EndpointPool(['a', 'b'], eject_after=2, eject_for=30)
+    a = pool.endpoints[0]
+    for _ in range(2):
+        pool.release(pool.acquire(exclude=[pool.endpoints[1]]), 0.01, False)
+    assert pool.stats()[0]['ejected']
+    assert [pool.acquire().url for _ in range(3)] == ['b'] * 3
+
+    # every endpoint is ejected, the one due back first is used
+    pool.endpoints[1].ejected_until = a.ejected_until + 10
+    assert pool.acquire().url == 'a'
+
+
+def test_failover():
+    down = FakeServer()
+    endpoint = down.endpoint
+    down.httpd.server_close()  # refuse the connections
+    with FakeServer() as server:
+        api = API(server.api_key, server.secret_key, [endpoint, server.endpoint],
+            retries=0, eject_after=1)
+        for _ in range(4):
+            assert api.request({'command': 'listZones', 'pagesize': 1})['count'] == 1000
+        stats = api.endpoints.stats()
+        assert stats[0]['ejected'] and not stats[1]['ejected']
+        assert [s['outstanding'] for s in stats] == [0, 0]
+
+        # a command which may have been applied is not sent again
+        api.endpoints.endpoints[0].ejected_until = 0
+        api.endpoints._next = 0
+        with pytest.raises(requests.ConnectionError):
+            api.request({'command': 'deployVirtualMachine', 'zoneid': 'z'})
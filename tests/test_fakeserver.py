@@ -0,0 +1,19 @@
+from csapi import API
+
+
+def test_request(api, server):
+    result = api.request({'command': 'listZones', 'pagesize': 10})
+    assert result['count'] == 250
+    assert len(result['zone']) == 10
+    assert result['zone'][0]['name'] == 'zone-0'
+
+
+def test_request_bad_signature(server):
+    api = API(server.api_key, 'wrong', server.endpoint)
+    assert api.request({'command': 'listZones'}) is None
+
+
+def test_job(api, server):
+    result = api.request({'command': 'stopVirtualMachine', 'id': 'vm-1'})
+    assert result == {'virtualmachine': {'id': 'vm-1'}}
+    assert server.stats()['requests'] >= 2  # the command and its polls
@@ -0,0 +1,82 @@
+import time
+
+import requests
+
+from csapi import API
+from csapi.fakeserver import FakeServer
+
+
+def test_submit_and_wait(api):
+    jobs = [api.submit({'command': 'stopVirtualMachine', 'id': str(i)}) for i in range(10)]
+    results = api.wait(jobs, timeout=5)
+    assert results == [{'virtualmachine': {'id': str(i)}} for i in range(10)]
+    assert api.jobs.pending() == 0
+
+
+def test_batched_polls(server):
+    with API(server.api_key, server.secret_key, server.endpoint,
+            poll_min_interval=0.02, poll_interval=0.1, batch_polls=True) as api:
+        assert api.jobs.batch
+        jobs = [api.submit({'command': 'stopVirtualMachine', 'id': str(i)}) for i in range(5)]
+        assert api.wait(jobs, timeout=5) == [{'virtualmachine': {'id': str(i)}} for i in range(5)]
+
+
+def test_jobs_survive_a_failed_poll(api):
+    call = api._call
+    failed = []
+
+    def flaky(params, method=None):
+        if params['command'] == 'queryAsyncJobResult' and not failed:
+            failed.append(params)
+            raise requests.ConnectionError('dropped')
+        return call(params, method)
+
+    api._call = flaky
+    job = api.submit({'command': 'stopVirtualMachine', 'id': 'a'})
+    assert job.result(5) == {'virtualmachine': {'id': 'a'}}
+    assert failed
+    assert api.submit({'command': 'stopVirtualMachine', 'id': 'b'}).result(5) is not None
+
+
+def test_lost_jobs_fail(api, server):
+    def lose_the_job(params, method, result, stats):
+        if params['command'] == 'stopVirtualMachine':
+            with server._lock:
+                server.jobs.clear()
+
+    api.after_request.append(lose_the_job)
+    job = api.submit({'command': 'stopVirtualMachine', 'id': 'a'})
+    assert job.result(5)['jobresult'] == {'errortext': 'Unable to query the job'}
+    assert job.status == 2
+
+    result = api.request({'command': 'stopVirtualMachine', 'id': 'b'})
+    assert result['jobstatus'] == 2
+    assert api.jobs.pending() == 0
+
+
+def test_new_jobs_are_polled_quickly(server):
+    with API(server.api_key, server.secret_key, server.endpoint,
+            poll_min_interval=0.05, poll_interval=5) as api:
+        first = api.submit({'command': 'stopVirtualMachine', 'id': 'a'})
+        time.sleep(0.6)  # the tracker backs off while 'first' is pending
+        start = time.time()
+        second = api.submit({'command': 'stopVirtualMachine', 'id': 'b'})
+        assert second.result(5) is not None
+        assert time.time() - start < 1
+        assert first.done()
+
+
+def test_jobs_are_queried_concurrently():
+    with FakeServer(latency=0.2, job_latency=0) as server:
+        with API(server.api_key, server.secret_key, server.endpoint,
+                poll_min_interval=0.01) as api:
+            jobs = [api.submit({'command': 'stopVirtualMachine', 'id': str(i)}) for i in range(8)]
+            start = time.time()
+            assert None not in api.wait(jobs, timeout=5)
+            assert time.time() - start < 8 * 0.2
+
+
+def test_tracker_restarts(api):
+    for i in range(20):
+        assert api.submit({'command': 'stopVirtualMachine', 'id': str(i)}).result(5) is not None
+        assert api.jobs.pending() == 0
@@ -0,0 +1,65 @@
+from csapi import Metrics
+
+
+def test_hooks_are_paired(api):
+    calls = []
+    api.before_request.append(lambda params, method: calls.append('before'))
+    api.after_request.append(lambda params, method, result, stats: calls.append(stats))
+    api.request({'command': 'listZones', 'pagesize': 1})
+    list(api.request({'command': 'listZones'}, stream=True))
+    key, api.api_key = api.api_key, None
+    assert api.request({'command': 'listZones'}) is None  # can not be signed
+    api.api_key = key
+    assert calls[0::2] == ['before'] * 3
+    assert [s['error'] for s in calls[1::2]] == [None, None, 'invalid request']
+    assert calls[3]['bytes_received'] > 0
+
+
+def test_metrics(api):
+    api.metrics = Metrics()
+    api.request({'command': 'listZones', 'pagesize': 1})
+    api.request({'command': 'listZones', 'pagesize': 1})
+    secret, api.secret_key = api.secret_key, 'wrong'
+    assert api.request({'command': 'listZones', 'pagesize': 1}) is None
+    api.secret_key = secret
+    api.request({'command': 'stopVirtualMachine', 'id': 'vm-1'})
+
+    metrics = api.metrics.as_dict()
+    zones = metrics['listZones']
+    assert (zones['calls'], zones['errors']) == (3, 1)
+    assert zones['bytes_received'] > 0
+    assert sorted(zones['latency']) == ['decode', 'network', 'sign']
+    assert zones['latency']['network']['count'] == 3
+
+    stop = metrics['stopVirtualMachine']
+    assert (stop['calls'], stop['errors']) == (1, 0)
+    assert stop['latency']['poll']['count'] == 1
+    assert metrics['queryAsyncJobResult']['calls'] >= 1
+
+    api.metrics.reset()
+    assert api.metrics.as_dict() == {}
+
+
+def test_prometheus():
+    metrics = Metrics(buckets=(0.1, 1))
+    metrics.observe('listZones', {'sign': 0.001, 'network': 0.5, 'bytes_received': 10})
+    metrics.observe('listZones', {'network': 2, 'error': 431, 'retries': 1})
+    metrics.record('deployVirtualMachine', 'poll', 3)
+
+    lines = metrics.prometheus(prefix='cs').splitlines()
+    assert '# TYPE cs_requests_total counter' in lines
+    assert 'cs_requests_total{command="listZones"} 2' in lines
+    assert 'cs_requests_total{command="deployVirtualMachine"} 0' in lines
+    assert 'cs_errors_total{command="listZones"} 1' in lines
+    assert 'cs_retries_total{command="listZones"} 1' in lines
+    assert 'cs_received_bytes_total{command="listZones"} 10' in lines
+    assert '# TYPE cs_latency_seconds histogram' in lines
+    network = [l for l in lines if 'phase="network"' in l]
+    assert network == [
+        'cs_latency_seconds_bucket{command="listZones",phase="network",le="0.1"} 0',
+        'cs_latency_seconds_bucket{command="listZones",phase="network",le="1"} 1',
+        'cs_latency_seconds_bucket{command="listZones",phase="network",le="+Inf"} 2',
+        'cs_latency_seconds_sum{command="listZones",phase="network"} 2.5',
+        'cs_latency_seconds_count{command="listZones",phase="network"} 2',
+    ]
+    assert 'cs_latency_seconds_count{command="deployVirtualMachine",phase="poll"} 1' in lines
@@ -0,0 +1,12 @@
+import pytest
+
+from csapi import TokenBucket
+
+
+def test_token_bucket():
+    with pytest.raises(ValueError):
+        TokenBucket(0)
+    bucket = TokenBucket(rate=10, burst=2)
+    assert bucket.delay() == 0
+    assert bucket.delay() == 0
+    assert 0 < bucket.delay() <= 0.1
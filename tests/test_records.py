@@ -0,0 +1,35 @@
+from decimal import Decimal
+
+from csapi import RecordStore
+
+
+def test_record_store():
+    store = RecordStore([
+        {'id': 'a', 'zoneid': 'z1', 'state': 'Running', 'nic': [{'ip': '10.0.0.1'}]},
+        {'id': 'b', 'zoneid': 'z2', 'state': 'Running'},
+        {'id': 'c', 'zoneid': 'z1', 'state': 'Stopped', 'extra': 1},
+    ])
+    assert len(store) == 3
+    assert store.get('a')['nic'] == [{'ip': '10.0.0.1'}]
+    assert store.get('missing') is None
+    assert [r['id'] for r in store.filter(zoneid='z1', state='Running')] == ['a']
+    assert sorted(store.index('zoneid')) == ['z1', 'z2']
+    assert 'extra' not in store.get('a')
+    assert store.get('c').to_dict() == {'id': 'c', 'zoneid': 'z1', 'state': 'Stopped', 'extra': 1}
+
+
+def test_shared_values_keep_their_type():
+    store = RecordStore([{'id': 'a', 'flag': True}, {'id': 'b', 'flag': 1}, {'id': 'c', 'flag': 1.0}])
+    assert [type(r['flag']) for r in store] == [bool, int, float]
+
+
+def test_decimals():
+    store = RecordStore([{'id': 'h', 'details': {'load': Decimal('1.5')}}])
+    assert store.get('h')['details'] == {'load': 1.5}
+
+
+def test_compact_request(api):
+    store = api.request({'command': 'listVirtualMachines', 'pagesize': 20}, compact=True)
+    assert len(store) == 20
+    assert store.count == 250
+    assert store.get('00000000-0000-4000-8000-000000000000')['name'] == 'virtualmachine-0'
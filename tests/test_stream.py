@@ -0,0 +1,28 @@
+import pytest
+import requests
+
+pytest.importorskip('ijson')
+
+from csapi import API
+
+
+def test_stream(api):
+    records = list(api.request(
+        {'command': 'listVirtualMachines'}, stream=True, fields=['id', 'name']))
+    assert len(records) == 250
+    assert records[0] == {'id': '00000000-0000-4000-8000-000000000000', 'name': 'virtualmachine-0'}
+
+    store = api.request({'command': 'listVirtualMachines'}, stream=True, compact=True)
+    assert len(store) == 250
+
+
+def test_stream_matches_request(api):
+    params = {'command': 'listVirtualMachines', 'pagesize': 5}
+    assert list(api.request(dict(params), stream=True)) == \
+        api.request(dict(params))['virtualmachine']
+
+
+def test_stream_error(server):
+    api = API(server.api_key, 'wrong', server.endpoint)
+    with pytest.raises(requests.HTTPError):
+        list(api.request({'command': 'listVirtualMachines'}, stream=True))